@@ -10,16 +10,25 @@
 
 from utils import Pose
 from graphics import *
-import config
+from gameconfig import GameConfig
 
 
 class Arena():
 
-    def __init__(self, arena):
+    # With autoflush False, drawing is only shown on the screen when
+    # flush() is called, which is much quicker when a lot changes at
+    # once.
+    def __init__(self, arena, autoflush=True):
         # Make a copy of the world an attribute, so that the graphics
         # have access.
         self.gameWorld = arena
 
+        # Settings come from the world, or from config.py if it
+        # doesn't have any.
+        self.config = getattr(arena, "config", None)
+        if self.config == None:
+            self.config = GameConfig.fromModule()
+
         # How many pixels the grid if offset in the window
         self.offset = 10
 
@@ -37,7 +46,8 @@ class Arena():
 
         # Setup window and draw objects
         self.pane = GraphWin("Mean Arena", ((2*self.offset)+((self.gameWorld.maxX+1)
-                             * self.magnify)), ((2*self.offset)+((self.gameWorld.maxY+1)*self.magnify)))
+                             * self.magnify)), ((2*self.offset)+((self.gameWorld.maxY+1)*self.magnify)),
+                             autoflush)
         self.pane.setBackground("white")
         self.drawBoundary()
         self.drawGrid()
@@ -79,7 +89,7 @@ class Arena():
 
     # We either use an image of Tallon, or a yellow circle
     def drawTallon(self):
-        if config.useImage:
+        if self.config.useImage:
             self.tallon = Image(self.convert2(
                 self.gameWorld.tLoc.x, self.gameWorld.tLoc.y), "images/tallon2.png")
         else:
@@ -93,7 +103,7 @@ class Arena():
     def drawMeanies(self):
         self.meanie = []
         for i in range(len(self.gameWorld.mLoc)):
-            if config.useImage:
+            if self.config.useImage:
                 self.meanie.append(Image(self.convert2(
                     self.gameWorld.mLoc[i].x, self.gameWorld.mLoc[i].y), "images/meanie.png"))
             else:
@@ -132,7 +142,7 @@ class Arena():
         self.bonuses = []
         for i in range(len(self.gameWorld.bLoc)):
             # If we use an image, do the same as for Tallon and the Meanies
-            if config.useImage:
+            if self.config.useImage:
                 self.bonuses.append(Image(self.convert2(
                     self.gameWorld.bLoc[i].x, self.gameWorld.bLoc[i].y), "images/bonus.png"))
             # Otherwise, do the same as for the pits
@@ -161,6 +171,10 @@ class Arena():
             self.meanie[i].undraw()
         self.drawMeanies()
 
+    # Show everything drawn so far.
+    def flush(self):
+        self.pane.update()
+
     # Take x and y coordinates and transform them for using offset and
     # magnify.
     #
@@ -0,0 +1,358 @@
+# batchworld.py
+#
+# A vectorized version of the Mean Arena. Where world.py keeps one
+# arena as lists of Pose objects, BatchWorld keeps the positions of
+# Tallon, the Meanies, the pits and the bonuses for N independent
+# arenas ("lanes") in NumPy arrays, and steps all of them at once.
+#
+# The rules are the same as in world.py, applied in the same order as
+# the loop in game.py:
+#
+#   updateTallon, updateMeanie, updateClock, addMeanie, updateScore,
+#   isEnded
+#
+# so scores from the two are directly comparable.
+#
+# This depends on numpy:
+#
+# pip install numpy
+
+import numpy as np
+from gameconfig import GameConfig
+from utils import Directions
+
+# Directions are passed in as their enum values, with NONE standing
+# for "no move" (what Tallon.makeMove() returns when it has nothing
+# to do).
+NONE = -1
+NORTH = Directions.NORTH.value
+SOUTH = Directions.SOUTH.value
+EAST = Directions.EAST.value
+WEST = Directions.WEST.value
+
+# Lookup tables for sideMove() in world.py, indexed by direction. The
+# last entry handles NONE, which sideMove() leaves alone.
+LEFT_OF = np.array([WEST, EAST, NORTH, SOUTH, NONE])
+RIGHT_OF = np.array([EAST, WEST, SOUTH, NORTH, NONE])
+
+
+class BatchWorld():
+
+    def __init__(self, lanes, seed=None, autoReset=True, config=None):
+        if config == None:
+            config = GameConfig.fromModule()
+        self.config = config
+
+        self.lanes = lanes
+        self.autoReset = autoReset
+        # Separate random number streams for placing things, moving
+        # the Meanies and Tallon's motion noise, as in world.py.
+        layout, meanie, motion = np.random.SeedSequence(seed).spawn(3)
+        self.layoutRandom = np.random.default_rng(layout)
+        self.meanieRandom = np.random.default_rng(meanie)
+        self.motionRandom = np.random.default_rng(motion)
+
+        # Boundaries of the world, as in world.py.
+        self.maxX = config.maxX
+        self.maxY = config.maxY
+        self.cells = (self.maxX + 1) * (self.maxY + 1)
+
+        self.numberOfMeanies = config.numberOfMeanies
+        self.numberOfBonuses = config.numberOfBonuses
+        self.numberOfPits = config.numberOfPits
+
+        # Tallon
+        self.tX = np.zeros(lanes, dtype=np.int64)
+        self.tY = np.zeros(lanes, dtype=np.int64)
+
+        # Meanies. Each lane has room for capacity Meanies, of which
+        # the first mCount are in play. The capacity grows as Meanies
+        # are added.
+        capacity = max(8, 2 * self.numberOfMeanies)
+        self.mX = np.zeros((lanes, capacity), dtype=np.int64)
+        self.mY = np.zeros((lanes, capacity), dtype=np.int64)
+        self.mCount = np.zeros(lanes, dtype=np.int64)
+
+        # Bonuses. bLive records which are still to be grabbed. Grabbed
+        # bonuses keep their position since, as in world.py, their
+        # location stays on the list of used locations.
+        self.bX = np.zeros((lanes, self.numberOfBonuses), dtype=np.int64)
+        self.bY = np.zeros((lanes, self.numberOfBonuses), dtype=np.int64)
+        self.bLive = np.zeros((lanes, self.numberOfBonuses), dtype=bool)
+
+        # Pits
+        self.pX = np.zeros((lanes, self.numberOfPits), dtype=np.int64)
+        self.pY = np.zeros((lanes, self.numberOfPits), dtype=np.int64)
+
+        # Clock, score and bonus flag for each lane.
+        self.clock = np.zeros(lanes, dtype=np.int64)
+        self.score = np.zeros(lanes, dtype=np.int64)
+        self.grabbed = np.zeros(lanes, dtype=bool)
+
+        # How many ticks in a row Tallon has not tried to move, in each
+        # lane.
+        self.idle = np.zeros(lanes, dtype=np.int64)
+
+        # Which lanes are still being simulated. Lanes only drop out
+        # when autoReset is False.
+        self.live = np.ones(lanes, dtype=bool)
+
+        # What happened on the last call to step(). done marks the
+        # lanes whose game ended, and finalScore/finalClock hold the
+        # score and clock those games ended with (the lanes themselves
+        # will already have been reset if autoReset is True).
+        self.done = np.zeros(lanes, dtype=bool)
+        self.finalScore = np.zeros(lanes, dtype=np.int64)
+        self.finalClock = np.zeros(lanes, dtype=np.int64)
+
+        self.reset(np.ones(lanes, dtype=bool))
+
+    #
+    # Access Methods
+    #
+
+    # Which Meanie slots are in play, as a (lanes, capacity) mask.
+    def meanieMask(self):
+        return np.arange(self.mX.shape[1]) < self.mCount[:, None]
+
+    # Current score in each lane.
+    def getScore(self):
+        return self.score
+
+    # Clock value in each lane.
+    def getClock(self):
+        return self.clock
+
+    #
+    # Methods
+    #
+
+    # Set up a fresh game in every lane picked out by the boolean mask
+    # lanes.
+    #
+    # world.py picks the location of each Meanie, Tallon, each bonus
+    # and each pit in turn, each one uniformly from the cells not yet
+    # used. That is the same as taking the front of a random
+    # permutation of the cells, which is what we do here.
+    def reset(self, lanes):
+        lanes = np.flatnonzero(lanes)
+        if len(lanes) == 0:
+            return
+        m = self.numberOfMeanies
+        b = self.numberOfBonuses
+        p = self.numberOfPits
+        needed = m + 1 + b + p
+        if needed > self.cells:
+            raise ValueError("Too many objects for a {} by {} world".format(
+                self.maxX + 1, self.maxY + 1))
+
+        keys = self.layoutRandom.random((len(lanes), self.cells))
+        picks = np.argpartition(keys, needed - 1, axis=1)[:, :needed]
+        # argpartition does not order the picks, so sort them by key
+        # to get a uniformly random order.
+        order = np.argsort(np.take_along_axis(keys, picks, axis=1), axis=1)
+        picks = np.take_along_axis(picks, order, axis=1)
+        xs, ys = self.toXY(picks)
+
+        self.mX[lanes, :m] = xs[:, :m]
+        self.mY[lanes, :m] = ys[:, :m]
+        self.mCount[lanes] = m
+        self.tX[lanes] = xs[:, m]
+        self.tY[lanes] = ys[:, m]
+        self.bX[lanes] = xs[:, m + 1:m + 1 + b]
+        self.bY[lanes] = ys[:, m + 1:m + 1 + b]
+        self.bLive[lanes] = True
+        self.pX[lanes] = xs[:, m + 1 + b:]
+        self.pY[lanes] = ys[:, m + 1 + b:]
+
+        self.clock[lanes] = 0
+        self.score[lanes] = 0
+        self.grabbed[lanes] = False
+        self.idle[lanes] = 0
+        self.live[lanes] = True
+
+    # Run one tick of the game in every live lane. actions holds one
+    # direction value (or NONE) per lane. Returns the done mask.
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        lanes = np.flatnonzero(self.live)
+
+        self.updateTallon(lanes, actions[lanes])
+        self.updateMeanie(lanes)
+        self.updateClock(lanes)
+        self.addMeanie(lanes)
+        self.updateScore(lanes)
+
+        self.done[:] = False
+        self.done[lanes] = self.isEnded(lanes)
+        ended = self.done
+        self.finalScore[ended] = self.score[ended]
+        self.finalClock[ended] = self.clock[ended]
+        if self.autoReset:
+            self.reset(ended)
+        else:
+            self.live[ended] = False
+        return self.done
+
+    # Implements the moves chosen for Tallon in the given lanes.
+    def updateTallon(self, lanes, actions):
+        self.grabbed[:] = False
+        self.idle[lanes] = np.where(actions == NONE, self.idle[lanes] + 1, 0)
+        direction = self.probabilisticMotion(actions)
+
+        x = self.tX[lanes]
+        y = self.tY[lanes]
+        # Note that y increases *down* the grid.
+        y = np.where((direction == SOUTH) & (y < self.maxY), y + 1, y)
+        y = np.where((direction == NORTH) & (y > 0), y - 1, y)
+        x = np.where((direction == EAST) & (x < self.maxX), x + 1, x)
+        x = np.where((direction == WEST) & (x > 0), x - 1, x)
+        self.tX[lanes] = x
+        self.tY[lanes] = y
+
+        # Did Tallon just grab a bonus? Bonuses are in different
+        # places, so at most one matches.
+        match = ((self.bX[lanes] == x[:, None]) &
+                 (self.bY[lanes] == y[:, None]) & self.bLive[lanes])
+        hit = match.any(axis=1)
+        self.bLive[lanes] &= ~match
+        self.grabbed[lanes] = hit
+        self.score[lanes] += hit * self.config.bonusValue
+
+    # Implement nondeterministic motion, if appropriate.
+    def probabilisticMotion(self, direction):
+        if not self.config.nonDeterministic:
+            return direction
+        n = len(direction)
+        slip = self.motionRandom.random(n) >= self.config.directionProbability
+        left = self.motionRandom.random(n) > 0.5
+        side = np.where(left, LEFT_OF[direction], RIGHT_OF[direction])
+        return np.where(slip, side, direction)
+
+    # Move the Meanies, if that is appropriate.
+    #
+    # Every Meanie in every lane is handled at once. A Meanie that can
+    # sense Tallon heads towards them, and otherwise it moves randomly.
+    def updateMeanie(self, lanes):
+        if not self.config.dynamic or len(lanes) == 0:
+            return
+        mX = self.mX[lanes]
+        mY = self.mY[lanes]
+        tX = self.tX[lanes][:, None]
+        tY = self.tY[lanes][:, None]
+        shape = mX.shape
+
+        # Compare squared distances rather than taking a square root.
+        dX = mX - tX
+        dY = mY - tY
+        sense = (dX * dX + dY * dY) < self.config.senseDistanceSquared
+
+        # One dice for every Meanie, shared between the two cases just
+        # as only one of moveToTallon() or makeRandomMove() is called
+        # for any Meanie.
+        dice = self.meanieRandom.random(shape) > 0.5
+
+        # moveToTallon(): move along whichever axis still differs, and
+        # pick one at random if both do.
+        chaseY = (dX == 0) | ((dY != 0) & dice)
+        chaseX = ~chaseY
+        stepX = -np.sign(dX)
+        stepY = -np.sign(dY)
+
+        # makeRandomMove(): change x or y by -1, 0 or +1.
+        change = self.meanieRandom.integers(0, 3, shape) - 1
+
+        moveX = np.where(sense, chaseX * stepX, dice * -change)
+        moveY = np.where(sense, chaseY * stepY, ~dice * -change)
+
+        active = self.meanieMask()[lanes]
+        self.mX[lanes] = np.where(active, np.clip(mX + moveX, 0, self.maxX), mX)
+        self.mY[lanes] = np.where(active, np.clip(mY + moveY, 0, self.maxY), mY)
+
+    # Increment the clock in the given lanes.
+    def updateClock(self, lanes):
+        self.clock[lanes] += 1
+
+    # Add a Meanie at intervals.
+    #
+    # As in world.py, the new Meanie goes in a cell that is not
+    # occupied by Tallon, another Meanie, a pit or a bonus (grabbed or
+    # not). world.py would search forever when there is no such cell;
+    # here that lane just doesn't get a new Meanie.
+    def addMeanie(self, lanes):
+        lanes = lanes[self.clock[lanes] % self.config.meanieInterval == 0]
+        if len(lanes) == 0:
+            return
+
+        taken = self.takenCells(lanes)
+        keys = self.layoutRandom.random(taken.shape)
+        keys[taken] = -1
+        cell = keys.argmax(axis=1)
+        free = keys[np.arange(len(lanes)), cell] >= 0
+        lanes = lanes[free]
+        cell = cell[free]
+        if len(lanes) == 0:
+            return
+
+        if self.mCount[lanes].max() >= self.mX.shape[1]:
+            self.grow()
+        x, y = self.toXY(cell)
+        slot = self.mCount[lanes]
+        self.mX[lanes, slot] = x
+        self.mY[lanes, slot] = y
+        self.mCount[lanes] += 1
+
+    # Increment the score at intervals.
+    def updateScore(self, lanes):
+        self.score[lanes] += (self.clock[lanes] % self.config.scoreInterval) == 0
+
+    # Which of the given lanes have ended? A game ends when Tallon is
+    # on the same cell as a Meanie or a pit, or, depending on the
+    # config, when the last bonus has been grabbed or the clock or
+    # idle limit has been reached (see endCause() in world.py).
+    def isEnded(self, lanes):
+        tX = self.tX[lanes][:, None]
+        tY = self.tY[lanes][:, None]
+        meanie = ((self.mX[lanes] == tX) & (self.mY[lanes] == tY) &
+                  self.meanieMask()[lanes]).any(axis=1)
+        pit = ((self.pX[lanes] == tX) & (self.pY[lanes] == tY)).any(axis=1)
+        ended = meanie | pit
+        if self.config.winOnLastBonus and self.numberOfBonuses > 0:
+            ended |= ~self.bLive[lanes].any(axis=1)
+        if self.config.maxClock > 0:
+            ended |= self.clock[lanes] >= self.config.maxClock
+        if self.config.maxIdleTicks > 0:
+            ended |= self.idle[lanes] >= self.config.maxIdleTicks
+        return ended
+
+    #
+    # Helpers
+    #
+
+    # Convert flat cell indices into x and y coordinates.
+    def toXY(self, cell):
+        return cell % (self.maxX + 1), cell // (self.maxX + 1)
+
+    # Convert x and y coordinates into flat cell indices.
+    def toCell(self, x, y):
+        return y * (self.maxX + 1) + x
+
+    # A (len(lanes), cells) mask of the cells that are in use in each
+    # of the given lanes.
+    def takenCells(self, lanes):
+        taken = np.zeros((len(lanes), self.cells), dtype=bool)
+        rows = np.arange(len(lanes))[:, None]
+        active = self.meanieMask()[lanes]
+        meanies = self.toCell(self.mX[lanes], self.mY[lanes])
+        taken[np.broadcast_to(rows, meanies.shape)[active], meanies[active]] = True
+        taken[rows, self.toCell(self.pX[lanes], self.pY[lanes])] = True
+        taken[rows, self.toCell(self.bX[lanes], self.bY[lanes])] = True
+        taken[rows[:, 0], self.toCell(self.tX[lanes], self.tY[lanes])] = True
+        return taken
+
+    # Double the room for Meanies in every lane.
+    def grow(self):
+        capacity = self.mX.shape[1]
+        pad = ((0, 0), (0, capacity))
+        self.mX = np.pad(self.mX, pad)
+        self.mY = np.pad(self.mY, pad)
@@ -0,0 +1,333 @@
+# bench.py
+#
+# Benchmarks for the Mean Arena, to see how fast things are and to
+# spot when a change makes them slower.
+#
+# run this using:
+#
+# python3 bench.py
+#
+# Options:
+#
+#   --save FILE        write the results to FILE as JSON, to use as a
+#                      baseline later
+#   --baseline FILE    compare with the results in FILE, and report
+#                      every benchmark that is more than --threshold
+#                      slower (default 0.1, that is 10%). Exits with
+#                      status 1 if there are any.
+#   --threshold X      see --baseline
+#   --only TEXT        only run benchmarks whose name contains TEXT
+#   --micro, --macro   only run the micro or the macro benchmarks
+#   --repeat N         time each benchmark N times and keep the best
+#                      (default 5)
+#   --budget S         roughly how many seconds to spend timing each
+#                      macro benchmark (default 0.5)
+#
+# The micro benchmarks time single operations: moving different
+# numbers of Meanies, picking a free cell for a new Meanie on a
+# crowded grid, filtering what Tallon can see, Tallon choosing a move,
+# and redrawing the arena (only if there is a display to draw on).
+# They also time starting a new Python and importing what a sweep
+# worker needs, which is what each worker process pays when it starts
+# (unless it is forked), and check that doing so doesn't load any of
+# HEAVY.
+#
+# The macro benchmarks play whole games of each configuration in the
+# grid used by evaluation.py, and measure steps and games per second.
+#
+# Every result is stored as seconds per operation, so for all of them
+# smaller is better.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import utils
+from world import World
+from tallon import Tallon
+from gameconfig import GameConfig
+from sweep import baseConfig, evaluationGrid
+
+# The file format version, in case it has to change.
+VERSION = 1
+
+# Modules that playing games without a display should never load:
+# they are slow to import, and tkinter needs a display.
+HEAVY = ["tkinter", "pandas", "numpy", "graphics", "arena"]
+
+
+# A world with count Meanies, on a grid big enough to hold them.
+def crowdedWorld(count, seed=0):
+    size = 10
+    while size * size < 4 * count:
+        size *= 2
+    config = GameConfig.fromModule(worldLength=size, worldBreadth=size,
+                                   numberOfMeanies=count, dynamic=True)
+    return World(seed, config)
+
+
+#
+# Micro benchmarks. Each one sets up what it needs and returns a
+# function that does one operation.
+#
+
+def benchUpdateMeanie(count):
+    def setup():
+        gameWorld = crowdedWorld(count)
+        # Snapshot so every run starts from the same place.
+        start = gameWorld.snapshot()
+        runs = [0]
+
+        def run():
+            gameWorld.updateMeanie()
+            runs[0] += 1
+            if runs[0] % 1000 == 0:
+                gameWorld.restore(start)
+        return run
+    return setup
+
+
+# A new Meanie's cell comes from World.pickFreePose(), so time that on
+# a size by size world with fill of its cells taken by Meanies.
+def benchPickFreePose(size, fill):
+    def setup():
+        config = GameConfig.fromModule(worldLength=size, worldBreadth=size)
+        gameWorld = World(0, config)
+        cells = gameWorld.cells
+        left = int(size * size * (1 - fill))
+        while len(cells.free) > left:
+            x, y = cells.coordinates(cells.pickFree(gameWorld.layoutRandom))
+            gameWorld.mLoc.append(utils.Pose(x, y))
+            cells.addMeanie(x, y)
+
+        def run():
+            gameWorld.pickFreePose()
+        return run
+    return setup
+
+
+def benchDistanceFiltered(count):
+    def setup():
+        gameWorld = crowdedWorld(count)
+
+        def run():
+            gameWorld.observation = None
+            gameWorld.distanceFiltered(gameWorld.mLoc)
+        return run
+    return setup
+
+
+def benchMakeMove():
+    def setup():
+        gameWorld = World(0)
+        player = Tallon(gameWorld)
+
+        def run():
+            gameWorld.observation = None
+            player.makeMove()
+        return run
+    return setup
+
+
+def benchArenaUpdate():
+    def setup():
+        # Drawing needs a display, and tkinter, neither of which may
+        # be there.
+        try:
+            from arena import Arena
+            display = Arena(World(0), autoflush=False)
+        except Exception:
+            return None
+
+        def run():
+            display.update()
+            display.flush()
+        return run
+    return setup
+
+
+def benchColdStart(module):
+    def setup():
+        here = os.path.dirname(os.path.abspath(__file__))
+        check = ("import sys\n"
+                 "import {}\n"
+                 "loaded = [m for m in {!r} if m in sys.modules]\n"
+                 "if loaded:\n"
+                 "    sys.exit('loaded ' + ', '.join(loaded))\n").format(
+                     module, HEAVY)
+        command = [sys.executable, "-c", check]
+
+        def run():
+            subprocess.run(command, cwd=here, check=True,
+                           stdout=subprocess.DEVNULL)
+        return run
+    return setup
+
+
+MICRO = {
+    "updateMeanie[10]": benchUpdateMeanie(10),
+    "updateMeanie[100]": benchUpdateMeanie(100),
+    "updateMeanie[1000]": benchUpdateMeanie(1000),
+    "pickFreePose[10x10, 90% full]": benchPickFreePose(10, 0.9),
+    "pickFreePose[50x50, 99% full]": benchPickFreePose(50, 0.99),
+    "distanceFiltered[10]": benchDistanceFiltered(10),
+    "distanceFiltered[1000]": benchDistanceFiltered(1000),
+    "makeMove": benchMakeMove(),
+    "Arena.update": benchArenaUpdate(),
+    "cold start[sweep]": benchColdStart("sweep"),
+    "cold start[env]": benchColdStart("env"),
+}
+
+
+# The best time per call of the function made by setup, or None if
+# setup returns None (the benchmark can't run here).
+def timeMicro(setup, repeat):
+    run = setup()
+    if run == None:
+        return None
+    timer = timeit.Timer(run)
+    number, elapsed = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+#
+# Macro benchmarks
+#
+
+# The name of the macro benchmarks for a configuration from the grid.
+def presetName(settings):
+    return ("size {worldLength} pits {numberOfPits} "
+            "bonuses {numberOfBonuses} spawn {meanieInterval}").format(
+                **settings)
+
+
+# Play games of config for about budget seconds, repeat times, and
+# return the best seconds per step and per game.
+def timeMacro(config, repeat, budget):
+    bestStep = bestGame = None
+    seed = 0
+    for r in range(repeat):
+        steps = games = 0
+        # Time spent stepping, and in all (which includes setting up
+        # each game).
+        stepping = elapsed = 0.0
+        while elapsed < budget / repeat or games == 0:
+            start = time.perf_counter()
+            gameWorld = World(seed, config)
+            player = Tallon(gameWorld)
+            seed += 1
+            playing = time.perf_counter()
+            done = False
+            while not done:
+                done = gameWorld.step(player.makeMove()).done
+                steps += 1
+            end = time.perf_counter()
+            stepping += end - playing
+            elapsed += end - start
+            games += 1
+        if bestStep == None or stepping / steps < bestStep:
+            bestStep = stepping / steps
+        if bestGame == None or elapsed / games < bestGame:
+            bestGame = elapsed / games
+    return bestStep, bestGame
+
+
+#
+# Running, saving and comparing
+#
+
+def runBenchmarks(args):
+    results = {}
+    if not args.macro:
+        for name, setup in MICRO.items():
+            if args.only and args.only not in name:
+                continue
+            seconds = timeMicro(setup, args.repeat)
+            report(name, seconds)
+            if seconds != None:
+                results[name] = seconds
+    if not args.micro:
+        base = baseConfig()
+        for settings in evaluationGrid():
+            name = presetName(settings)
+            if args.only and args.only not in name:
+                continue
+            perStep, perGame = timeMacro(base.replace(**settings),
+                                         args.repeat, args.budget)
+            report(name + " step", perStep)
+            report(name + " game", perGame)
+            results[name + " step"] = perStep
+            results[name + " game"] = perGame
+    return results
+
+
+def report(name, seconds):
+    if seconds == None:
+        print("{:<52} skipped".format(name))
+    else:
+        print("{:<52} {:>12.3f} us {:>12.0f}/s".format(
+            name, seconds * 1e6, 1 / seconds))
+
+
+def environment():
+    try:
+        import numpy
+        numpyVersion = numpy.__version__
+    except ImportError:
+        numpyVersion = None
+    return {"python": platform.python_version(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "numpy": numpyVersion,
+            "cpus": os.cpu_count()}
+
+
+def save(path, results):
+    with open(path, "w") as f:
+        json.dump({"version": VERSION, "environment": environment(),
+                   "seconds": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# The benchmarks in results that are more than threshold slower than
+# in the baseline at path, as a list of (name, old, new).
+def regressions(path, results, threshold):
+    with open(path) as f:
+        baseline = json.load(f)["seconds"]
+    slower = []
+    for name, seconds in results.items():
+        old = baseline.get(name)
+        if old != None and seconds > old * (1 + threshold):
+            slower.append((name, old, seconds))
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mean Arena benchmarks")
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--only")
+    parser.add_argument("--micro", action="store_true")
+    parser.add_argument("--macro", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = runBenchmarks(args)
+
+    if args.save:
+        save(args.save, results)
+
+    if args.baseline:
+        slower = regressions(args.baseline, results, args.threshold)
+        for name, old, new in slower:
+            print("SLOWER {:<45} {:>10.3f} us -> {:>10.3f} us ({:+.0%})".format(
+                name, old * 1e6, new * 1e6, new / old - 1))
+        if len(slower) > 0:
+            sys.exit(1)
+        print("No regressions")
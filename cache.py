@@ -0,0 +1,126 @@
+# cache.py
+#
+# A store of games that have already been played, so that a sweep (see
+# sweep.py) that is run again only plays the games it hasn't played
+# before.
+#
+# Each game is stored under a key made by hashing everything that
+# decides how it goes:
+#
+#   the settings (every value in its GameConfig, not just the ones
+#   that differ from config.py);
+#
+#   the seed;
+#
+#   the source of the code controlling Tallon (tallon.py, and
+#   planner.py which it uses to choose its moves), so that changing
+#   Tallon means games are played again.
+#
+#   the version of numpy (or that there isn't one), since games with
+#   many Meanies play out differently with and without it, and
+#   perhaps with different versions (see world.numpyVersion()).
+#
+# Nothing else goes into the key, so if you change the rules of the
+# game (world.py) delete the cache file.
+#
+# The cache is an SQLite database, written from one process. Results
+# are committed in batches; if the program is killed, all but the last
+# batch are kept.
+
+import hashlib
+import inspect
+import json
+import sqlite3
+
+# Change this when the way results are produced changes, to stop
+# older results being used.
+VERSION = 1
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# A hash of all the settings in config (a GameConfig).
+def configDigest(config):
+    return sha256(json.dumps(config.settings(), sort_keys=True))
+
+
+# A hash of the source of module.
+def sourceDigest(module):
+    return sha256(inspect.getsource(module))
+
+
+# A hash of the source of all of modules, for the code that makes up
+# an agent.
+def agentDigest(modules):
+    return sha256("".join(sourceDigest(module) for module in modules))
+
+
+# The key for a game played with config and seed, by the agent whose
+# source hashes to agentDigest, with the numpy version given by numpy.
+def episodeKey(config, seed, agentDigest, numpy=None):
+    return sha256("{}:{}:{}:{}:{}".format(VERSION, configDigest(config), seed,
+                                          agentDigest, numpy))
+
+
+class ResultCache():
+
+    def __init__(self, path, commitEvery=64):
+        self.path = path
+        self.commitEvery = commitEvery
+        self.pending = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS episodes ("
+                        "key TEXT PRIMARY KEY, score INTEGER, clock INTEGER)")
+        self.db.commit()
+
+    # The (score, clock) stored under key, or None.
+    def get(self, key):
+        row = self.db.execute("SELECT score, clock FROM episodes "
+                              "WHERE key = ?", (key,)).fetchone()
+        if row == None:
+            return None
+        return tuple(row)
+
+    # A dictionary from those keys that are in the cache to their
+    # (score, clock).
+    def getMany(self, keys):
+        keys = list(keys)
+        found = {}
+        # SQLite limits how many values one query can take.
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            query = ("SELECT key, score, clock FROM episodes WHERE key IN ("
+                     + ",".join("?" * len(batch)) + ")")
+            for key, score, clock in self.db.execute(query, batch):
+                found[key] = (score, clock)
+        return found
+
+    def put(self, key, score, clock):
+        self.db.execute("INSERT OR REPLACE INTO episodes VALUES (?, ?, ?)",
+                        (key, score, clock))
+        self.pending += 1
+        if self.pending >= self.commitEvery:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+
+    def close(self):
+        if self.db == None:
+            return
+        self.commit()
+        self.db.close()
+        self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
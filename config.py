@@ -57,3 +57,24 @@ meanieInterval = 5
 # If useImage is True, then we use images for Tallon, Meanies and
 # Bonuses. If it is False, then we use simple colored objects.
 useImage = True
+
+# Ending the game
+#
+# The game always ends when Tallon meets a Meanie or falls in a pit.
+#
+# If winOnLastBonus is True, the game also ends, and Tallon wins, when
+# the last bonus is grabbed.
+winOnLastBonus = False
+#
+# If maxClock is more than 0, the game ends when the clock gets to
+# maxClock.
+maxClock = 0
+#
+# If maxIdleTicks is more than 0, the game ends when Tallon hasn't
+# tried to move for maxIdleTicks ticks in a row.
+maxIdleTicks = 0
+#
+# If fastForward is more than 0, then when Tallon doesn't try to move,
+# World.step() runs on for up to fastForward ticks in one go, as long
+# as nothing can happen to Tallon in that time.
+fastForward = 0
@@ -0,0 +1,306 @@
+# env.py
+#
+# A headless, Gym-style interface to the Mean Arena, for training and
+# evaluating controllers for Tallon without a display.
+#
+# MeanArenaEnv wraps a single World:
+#
+#   env = MeanArenaEnv()
+#   observation = env.reset(seed=42)
+#   observation, reward, done, info = env.step(Directions.NORTH)
+#
+# VectorEnv runs K of them side by side, either in this process or
+# spread across worker processes that share their buffers with this
+# one, and returns numpy arrays with one row per environment.
+#
+# In this process the K games are stepped one after another, each by
+# its own World, so only the results are batched, not the work. Games
+# that really are stepped all at once in arrays are what batchworld.py
+# is for, but BatchWorld doesn't filter what Tallon can see, and
+# draws its random numbers differently, so it doesn't give the same
+# games as MeanArenaEnv. VectorEnv does, with the same seed, whether
+# it runs in this process or in workers.
+#
+# Nothing here imports arena.py, graphics.py or tkinter.
+#
+# VectorEnv depends on numpy:
+#
+# pip install numpy
+
+import multiprocessing
+import os
+import random
+from world import World
+from gameconfig import GameConfig
+from utils import Directions
+
+# The planes of an encoded observation (see encodeObservation()).
+TALLON = 0
+MEANIES = 1
+BONUSES = 2
+PITS = 3
+PLANES = 4
+
+# Actions can be given as Directions, as their values, or as None or
+# -1 for no move.
+DIRECTIONS = {d.value: d for d in Directions}
+
+
+def toDirection(action):
+    if action == None or isinstance(action, Directions):
+        return action
+    return DIRECTIONS.get(int(action))
+
+
+# The value of an action, with -1 for no move.
+def actionValue(action):
+    direction = toDirection(action)
+    if direction == None:
+        return -1
+    return direction.value
+
+
+class MeanArenaEnv():
+
+    # Games are played with config (a GameConfig), by default whatever
+    # config.py says when the environment is made.
+    def __init__(self, seed=None, config=None):
+        if config == None:
+            config = GameConfig.fromModule()
+        self.config = config
+        # Where seeds come from when reset() isn't given one.
+        self.seeds = random.Random(seed)
+        self.world = None
+
+    # Start a new game and return the first observation.
+    def reset(self, seed=None):
+        if seed == None:
+            seed = self.seeds.getrandbits(64)
+        self.world = World(seed, self.config)
+        return self.world.observe()
+
+    # Play one tick. Returns the observation after the tick, the
+    # change in score, whether the game is over, and the StepResult
+    # for the tick.
+    def step(self, action):
+        result = self.world.step(toDirection(action))
+        return self.world.observe(), result.reward, result.done, result
+
+    # The current score
+    def getScore(self):
+        return self.world.getScore()
+
+
+# Fill out (an array of shape (PLANES, maxY + 1, maxX + 1)) with what
+# is in observation: a 1 where Tallon is, the number of Meanies in each
+# cell, and a 1 for each visible bonus and pit.
+def encodeObservation(observation, out):
+    out[:] = 0
+    out[TALLON, observation.tallon.y, observation.tallon.x] = 1
+    for m in observation.meanies:
+        out[MEANIES, m.y, m.x] += 1
+    for b in observation.bonuses:
+        out[BONUSES, b.y, b.x] = 1
+    for p in observation.pits:
+        out[PITS, p.y, p.x] = 1
+
+
+class VectorEnv():
+
+    # count environments, seeded from seed and all playing with config.
+    # With processes set to 0 everything runs in this process, one
+    # environment after another; otherwise the environments are split
+    # across that many worker processes (None means one per CPU).
+    def __init__(self, count, seed=None, processes=0, config=None):
+        import numpy as np
+
+        if config == None:
+            config = GameConfig.fromModule()
+        self.config = config
+        self.count = count
+        seeds = random.Random(seed)
+        envSeeds = [seeds.getrandbits(64) for i in range(count)]
+        shape = (count, PLANES, config.worldBreadth, config.worldLength)
+
+        if processes == None:
+            processes = os.cpu_count() or 1
+        processes = min(processes, count)
+        self.workers = []
+
+        if processes == 0:
+            self.envs = [MeanArenaEnv(s, config) for s in envSeeds]
+            self.buffers = {
+                "observations": np.zeros(shape, dtype=np.int16),
+                "actions": np.full(count, -1, dtype=np.int64),
+                "rewards": np.zeros(count, dtype=np.int64),
+                "dones": np.zeros(count, dtype=bool),
+                "scores": np.zeros(count, dtype=np.int64),
+                "clocks": np.zeros(count, dtype=np.int64),
+            }
+        else:
+            self.envs = None
+            self.shared = SharedBuffers(count, shape)
+            self.buffers = self.shared.arrays()
+            for i in range(processes):
+                lanes = range(i * count // processes,
+                               (i + 1) * count // processes)
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=workerMain, daemon=True,
+                    args=(child, self.shared.names(), count, shape,
+                          list(lanes), [envSeeds[j] for j in lanes],
+                          config))
+                process.start()
+                child.close()
+                self.workers.append((process, parent))
+
+        self.observations = self.buffers["observations"]
+        self.rewards = self.buffers["rewards"]
+        self.dones = self.buffers["dones"]
+
+    # Start a new game in every environment. Returns the observations.
+    def reset(self):
+        if self.envs != None:
+            for i in range(self.count):
+                resetLane(self.envs, self.buffers, i)
+        else:
+            self.command("reset")
+        return self.observations
+
+    # Play one tick in every environment. actions holds one action
+    # per environment (see toDirection()).
+    #
+    # Returns the observations, rewards and done flags, and a
+    # dictionary holding the score and clock each game had at the end
+    # of the tick. Environments whose game ended are reset straight
+    # away, so their observation is the first one of the next game.
+    def step(self, actions):
+        self.buffers["actions"][:] = [actionValue(a) for a in actions]
+        if self.envs != None:
+            for i in range(self.count):
+                stepLane(self.envs, self.buffers, i)
+        else:
+            self.command("step")
+        info = {"scores": self.buffers["scores"],
+                "clocks": self.buffers["clocks"]}
+        return self.observations, self.rewards, self.dones, info
+
+    # Shut down the worker processes, if there are any.
+    def close(self):
+        if len(self.workers) == 0:
+            return
+        self.command("close")
+        for process, pipe in self.workers:
+            process.join()
+            pipe.close()
+        self.workers = []
+        self.buffers = None
+        self.observations = self.rewards = self.dones = None
+        self.shared.release()
+
+    # Send a command to every worker and wait for them all to finish.
+    def command(self, name):
+        for process, pipe in self.workers:
+            pipe.send(name)
+        for process, pipe in self.workers:
+            pipe.recv()
+
+
+#
+# Helpers shared by the in-process and worker process versions.
+#
+
+def resetLane(envs, buffers, i, lane=None):
+    if lane == None:
+        lane = i
+    observation = envs[i].reset()
+    encodeObservation(observation, buffers["observations"][lane])
+    buffers["rewards"][lane] = 0
+    buffers["dones"][lane] = False
+    buffers["scores"][lane] = 0
+    buffers["clocks"][lane] = 0
+
+
+def stepLane(envs, buffers, i, lane=None):
+    if lane == None:
+        lane = i
+    action = buffers["actions"][lane]
+    observation, reward, done, result = envs[i].step(
+        None if action < 0 else action)
+    buffers["rewards"][lane] = reward
+    buffers["dones"][lane] = done
+    buffers["scores"][lane] = envs[i].getScore()
+    buffers["clocks"][lane] = result.clock
+    if done:
+        observation = envs[i].reset()
+    encodeObservation(observation, buffers["observations"][lane])
+
+
+# The buffers a VectorEnv shares with its worker processes, each one a
+# block of shared memory viewed as a numpy array.
+class SharedBuffers():
+
+    def __init__(self, count, shape, names=None):
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        self.layout = {
+            "observations": (shape, np.int16),
+            "actions": ((count,), np.int64),
+            "rewards": ((count,), np.int64),
+            "dones": ((count,), np.bool_),
+            "scores": ((count,), np.int64),
+            "clocks": ((count,), np.int64),
+        }
+        self.memory = {}
+        for key, (size, dtype) in self.layout.items():
+            if names == None:
+                nbytes = int(np.prod(size)) * np.dtype(dtype).itemsize
+                self.memory[key] = shared_memory.SharedMemory(
+                    create=True, size=max(nbytes, 1))
+            else:
+                self.memory[key] = shared_memory.SharedMemory(
+                    name=names[key])
+        self.owner = names == None
+
+    def names(self):
+        return {key: memory.name for key, memory in self.memory.items()}
+
+    def arrays(self):
+        import numpy as np
+        return {key: np.ndarray(size, dtype=dtype,
+                                buffer=self.memory[key].buf)
+                for key, (size, dtype) in self.layout.items()}
+
+    def release(self):
+        for memory in self.memory.values():
+            # If arrays viewing the memory are still around it can't
+            # be closed yet; it goes when they do.
+            try:
+                memory.close()
+            except BufferError:
+                pass
+            if self.owner:
+                memory.unlink()
+
+
+# The loop run by each worker process. It looks after the environments
+# for the given lanes and does what it is told over pipe.
+def workerMain(pipe, names, count, shape, lanes, seeds, config):
+    shared = SharedBuffers(count, shape, names)
+    buffers = shared.arrays()
+    envs = [MeanArenaEnv(s, config) for s in seeds]
+    while True:
+        name = pipe.recv()
+        if name == "reset":
+            for i in range(len(envs)):
+                resetLane(envs, buffers, i, lanes[i])
+        elif name == "step":
+            for i in range(len(envs)):
+                stepLane(envs, buffers, i, lanes[i])
+        elif name == "close":
+            del buffers
+            shared.release()
+            pipe.send(True)
+            return
+        pipe.send(True)
@@ -1,103 +1,194 @@
-# game.py
+# evaluation.py
 #
-# The top level loop that runs the game until Tallon eventually loses.
+# Play Tallon over a grid of configurations (see sweep.py) and record
+# how every game went.
 #
 # run this using:
 #
-# python3 game.py
+# python3 evaluation.py
 #
-# Written by: Simon Parsons
-# Last Modified: 12/01/22
-
-# Run following commands......
-# This depends on following libraries.
+# Options:
+#
+#   --output FILE   where to write a row per game (default
+#                   evaluation.csv). A .jsonl or .parquet file works
+#                   too (see results.py). Rows are written as games
+#                   finish; the file is replaced on each run.
+#   --excel FILE    also write a summary, one row per configuration,
+#                   to an Excel file at the end.
+#   --cache FILE    where to keep every game played (default
+#                   evaluation.sqlite, see cache.py). Games already in
+#                   it are not played again, so a run that was stopped
+#                   carries on where it left off, and adding a
+#                   configuration only plays that configuration.
+#   --no-cache      play every game
+#   --seed N        seed the sweep (default 0). The same seed gives the
+#                   same games, which is what lets the cache be used.
+#   --processes N   how many worker processes to use (default one per
+#                   CPU; 0 plays everything in this process)
+#   --adaptive      rather than playing each configuration a set
+#                   number of times, play it until the 95% confidence
+#                   interval on its mean score is within --half-width
+#                   (default 5) either side, with at least
+#                   --min-episodes (default 10) and at most
+#                   --max-episodes (default 100) games. See
+#                   sweep.AdaptiveSweep.
+#   --quiet         don't print anything while the sweep runs
+#   --instrument FILE
+#                   time each part of every game played (see
+#                   instrument.py), writing the timings of each game
+#                   to FILE (a .jsonl file) as it finishes, and a
+#                   summary at the end. Games from the cache aren't
+#                   timed, so use --no-cache to time them all.
+#
+# As each configuration finishes, its total, mean (with a 95%
+# confidence interval), spread and median score are printed, and at
+# the end there is a table of them all (see stats.py).
+#
+# The Excel summary depends on following libraries.
 #
 # pip install pandas
 # pip install xlsxwriter
-# pip install xlrd
-# pip install openpyxl
-
-from world import World
-from tallon import Tallon
-from arena import Arena
-import pandas as pd
-import random
-import utils
-import time
-import config
-
-data = {
-    "size": [],
-    "pits": [],
-    "bonuses": [],
-    "spawn": [],
-    "total": [],
-    "times": [],
-}
-
-for size in [10, 15, 20]:
-    config.worldBreadth = size
-    config.worldLength = size
-    for pits in [3, 4, 5]:
-        config.numberOfPits = pits
-        for bonuses in [2, 3, 4]:
-            config.numberOfBonuses = bonuses
-            for spawnSpeed in [5, 4, 3]:
-                config.meanieInterval = spawnSpeed
-                times = random.randrange(20, 35)
-                data["size"].append(size)
-                data["pits"].append(pits)
-                data["bonuses"].append(bonuses)
-                data["spawn"].append(spawnSpeed)
-                data["times"].append(times)
-                totalScore = "="
-                first = True
+
+import argparse
+from sweep import Sweep, AdaptiveSweep, evaluationGrid
+from results import ResultSink
+from cache import ResultCache
+from instrument import Instruments
+from stats import summaryTable, SUMMARY_COLUMNS
+
+
+# The row written for each game.
+def episodeRow(sweep, result):
+    settings = sweep.configurations[result.configuration]
+    return {
+        "configuration": result.configuration,
+        "size": settings["worldLength"],
+        "pits": settings["numberOfPits"],
+        "bonuses": settings["numberOfBonuses"],
+        "spawn": settings["meanieInterval"],
+        "episode": result.episode,
+        "seed": result.seed,
+        "score": result.score,
+        "clock": result.clock,
+    }
+
+
+# How a configuration is shown in the summary table.
+def configurationLabel(settings):
+    return "size {} pits {} bonuses {} spawn {}".format(
+        settings["worldLength"], settings["numberOfPits"],
+        settings["numberOfBonuses"], settings["meanieInterval"])
+
+
+# The summary table of the scores of every configuration so far.
+def scoreTable(sweep):
+    return summaryTable([configurationLabel(s) for s in sweep.configurations],
+                        sweep.summaries)
+
+
+# Write the summary of each configuration to an Excel file.
+def writeExcel(path, sweep):
+    import pandas as pd
+
+    data = {
+        "size": [],
+        "pits": [],
+        "bonuses": [],
+        "spawn": [],
+        "times": [],
+    }
+    for name in SUMMARY_COLUMNS:
+        data[name] = []
+    for index, settings in enumerate(sweep.configurations):
+        data["size"].append(settings["worldLength"])
+        data["pits"].append(settings["numberOfPits"])
+        data["bonuses"].append(settings["numberOfBonuses"])
+        data["spawn"].append(settings["meanieInterval"])
+        data["times"].append(sweep.episodes[index])
+        row = sweep.summaries[index].row()
+        for name in SUMMARY_COLUMNS:
+            data[name].append(row[name])
+
+    df = pd.DataFrame(data)
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        df.to_excel(writer, sheet_name='Sheet1', index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate Tallon")
+    parser.add_argument("--output", default="evaluation.csv")
+    parser.add_argument("--excel")
+    parser.add_argument("--cache", default="evaluation.sqlite")
+    parser.add_argument("--no-cache", dest="cache", action="store_const",
+                        const=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--half-width", type=float, default=5.0)
+    parser.add_argument("--min-episodes", type=int, default=10)
+    parser.add_argument("--max-episodes", type=int, default=100)
+    parser.add_argument("--instrument", metavar="FILE")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    # Play every configuration in the grid, spread over all the CPUs.
+    # Games finish in any order, so all we keep is each
+    # configuration's running total, and how many games it has had.
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.cache)
+    if args.adaptive:
+        sweep = AdaptiveSweep(evaluationGrid(), seed=args.seed,
+                              halfWidth=args.half_width,
+                              minEpisodes=args.min_episodes,
+                              maxEpisodes=args.max_episodes,
+                              processes=args.processes, cache=cache,
+                              instrument=bool(args.instrument))
+    else:
+        sweep = Sweep(evaluationGrid(), seed=args.seed,
+                      processes=args.processes, cache=cache,
+                      instrument=bool(args.instrument))
+
+    timings = None
+    allTimings = Instruments()
+    if args.instrument:
+        timings = ResultSink(args.instrument, append=False)
+
+    with ResultSink(args.output, append=False) as sink:
+        for result in sweep.run():
+            sink.write(episodeRow(sweep, result))
+            if result.instruments != None:
+                row = {"configuration": result.configuration,
+                       "episode": result.episode, "seed": result.seed}
+                row.update(result.instruments.toDict())
+                timings.write(row)
+                allTimings.merge(result.instruments)
+            # The sweep keeps a summary of each configuration's scores
+            # as they come in. An adaptive sweep only knows how many
+            # games a configuration gets once it has finished with it.
+            index = result.configuration
+            summary = sweep.summaries[index]
+            if summary.count == sweep.episodes[index] and not args.quiet:
+                settings = sweep.configurations[index]
+                row = summary.row()
                 print('--------------------------------------------------------------')
                 print('Size = {}, Pits = {}, Bonuses = {}, Spawn = {}, Times = {}'.format(
-                    size, pits, bonuses, spawnSpeed, times))
-                for i in range(times):
-                    print('--------------------------------------------------')
-                    print('>>> {} evaluation <<<'.format(i + 1))
-                    # How we set the game up. Create a world, then connect player and
-                    # display to it.
-                    gameWorld = World()
-                    player = Tallon(gameWorld)
-                    # display = Arena(gameWorld)
-
-                    # Uncomment this for a printout of world state at the start
-                    # utils.printGameState(gameWorld)
-
-                    # Now run...
-                    while not(gameWorld.isEnded()):
-                        gameWorld.updateTallon(player.makeMove())
-                        gameWorld.updateMeanie()
-                        gameWorld.updateClock()
-                        gameWorld.addMeanie()
-                        gameWorld.updateScore()
-                        # display.update()
-                        # Uncomment this for a printout of world state every step
-                        # utils.printGameState(gameWorld)
-                        # time.sleep(0.01)
-
-                    if not first:
-                        totalScore = totalScore + "+"
-                    totalScore = totalScore + "{}".format(gameWorld.getScore())
-                    first = False
-
-                    # display.close()
-                    # del display
-                    del player
-                    del gameWorld
-                print('Total {}'.format(totalScore))
-                data["total"].append(totalScore)
-
-df = pd.DataFrame(data)
-
-# Create a Pandas Excel writer using XlsxWriter as the engine.
-writer = pd.ExcelWriter('C:\\evaluation.xlsx', engine='xlsxwriter')
-
-# Convert the dataframe to an XlsxWriter Excel object.
-df.to_excel(writer, sheet_name='Sheet1', index=False)
-
-# Close the Pandas Excel writer and output the Excel file.
-writer.save()
+                    settings["worldLength"], settings["numberOfPits"],
+                    settings["numberOfBonuses"], settings["meanieInterval"],
+                    sweep.episodes[index]))
+                print('Total {}, mean {:.2f} +/- {:.2f}, stdev {:.2f}, min {}, median {:.1f}, max {}'.format(
+                    row["total"], row["mean"], row["halfWidth"], row["stdev"],
+                    row["min"], row["p50"], row["max"]))
+
+    if cache != None:
+        cache.close()
+
+    if not args.quiet:
+        print(scoreTable(sweep))
+
+    if timings != None:
+        timings.close()
+        print(allTimings.summary())
+
+    if args.excel:
+        writeExcel(args.excel, sweep)
@@ -0,0 +1,144 @@
+# events.py
+#
+# What happens in a game, as events that World sends to a sink rather
+# than printing.
+#
+#   gameWorld.setEventSink(PrintSink())     # the messages game.py shows
+#   gameWorld.setEventSink(CountingSink())  # just count them
+#   gameWorld.setEventSink(LogSink("game.jsonl"))
+#
+# A world starts with NULL_SINK, which throws everything away. Sinks
+# say whether they want events at all (enabled); when they don't, the
+# world doesn't even make them, so a game that nobody is watching does
+# no extra work and no I/O.
+#
+# The events are:
+#
+#   Tick          a call to World.step() finished
+#   BonusGrabbed  Tallon grabbed a bonus
+#   MeanieAdded   a new Meanie appeared
+#   GameEnded     the game ended, and why (a utils.Cause)
+
+import json
+import sys
+from collections import Counter
+from collections import namedtuple
+from enum import Enum
+from utils import Cause
+
+# clock is the clock at the end of the step, score the score, and
+# ticks how many ticks the step took (see World.fastForward()).
+Tick = namedtuple('Tick', ['clock', 'score', 'ticks'])
+
+# where the bonus was, and how many are left.
+BonusGrabbed = namedtuple('BonusGrabbed', ['clock', 'where', 'left'])
+
+# where the Meanie was put.
+MeanieAdded = namedtuple('MeanieAdded', ['clock', 'where'])
+
+GameEnded = namedtuple('GameEnded', ['clock', 'score', 'cause'])
+
+
+# Throws everything away.
+class NullSink():
+    enabled = False
+
+    def emit(self, event):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+# Counts each kind of event, and each cause of the game ending.
+class CountingSink():
+    enabled = True
+
+    def __init__(self):
+        self.counts = Counter()
+        self.causes = Counter()
+
+    def emit(self, event):
+        self.counts[type(event).__name__] += 1
+        if type(event) == GameEnded:
+            self.causes[event.cause] += 1
+
+    def close(self):
+        pass
+
+
+# Writes each event as a line of JSON to a file (given by its path, or
+# already open), holding them until there are bufferSize of them. The
+# Tick events are left out unless ticks is True, since there are so
+# many of them.
+class LogSink():
+    enabled = True
+
+    def __init__(self, file, bufferSize=256, ticks=False):
+        self.owned = isinstance(file, str)
+        if self.owned:
+            file = open(file, "a")
+        self.file = file
+        self.bufferSize = bufferSize
+        self.ticks = ticks
+        self.lines = []
+
+    def emit(self, event):
+        if type(event) == Tick and not self.ticks:
+            return
+        record = {"event": type(event).__name__}
+        for name, value in event._asdict().items():
+            if isinstance(value, Enum):
+                value = value.name
+            elif isinstance(value, tuple):
+                value = list(value)
+            record[name] = value
+        self.lines.append(json.dumps(record))
+        if len(self.lines) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.lines) > 0:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.lines = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.owned:
+            self.file.close()
+
+
+# Prints the messages the game has always printed.
+class PrintSink():
+    enabled = True
+
+    # What is printed when the game ends, by cause.
+    endings = {Cause.MEANIE: "Oops! Met a Meanie",
+               Cause.PIT: "Arghhhhh! Fell in a pit",
+               Cause.BONUSES: "Got all the bonuses!",
+               Cause.CLOCK: "Out of time",
+               Cause.IDLE: "Tallon stood still for too long"}
+
+    def __init__(self, file=None):
+        self.file = file
+
+    def emit(self, event):
+        kind = type(event)
+        if kind == BonusGrabbed:
+            if event.left == 0:
+                self.show("Got the last bonus!")
+            else:
+                self.show("Bonus, yeah!")
+        elif kind == GameEnded:
+            self.show(self.endings[event.cause])
+            self.show("Game Over!")
+
+    def show(self, message):
+        print(message, file=self.file or sys.stdout)
+
+    def close(self):
+        pass
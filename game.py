@@ -6,34 +6,61 @@
 #
 # python3 game.py
 #
+# or, to play the game that goes with a particular seed (the same seed
+# always gives the same game):
+#
+# python3 game.py 42
+#
+# To see where the time goes in the game (see instrument.py), add
+# --instrument and a file to write the timings to:
+#
+# python3 game.py --instrument timings.json
+#
 # Written by: Simon Parsons
 # Last Modified: 12/01/22
 
 from world import World
+from gameconfig import GameConfig
 from tallon import Tallon
 from arena import Arena
+from events import PrintSink
 import utils
 import time
+import argparse
+
+parser = argparse.ArgumentParser(description="Play the Mean Arena")
+parser.add_argument("seed", nargs="?", type=int)
+parser.add_argument("--instrument", metavar="FILE")
+args = parser.parse_args()
 
 # How we set the game up. Create a world, then connect player and
 # display to it.
-gameWorld = World()
+# Tallon always moves the way it chooses to (set nonDeterministic to
+# True to see how it copes when it doesn't).
+gameWorld = World(args.seed, GameConfig.fromModule(nonDeterministic=False))
+gameWorld.setEventSink(PrintSink())
 player = Tallon(gameWorld)
 display = Arena(gameWorld)
 
+instruments = None
+if args.instrument:
+    from instrument import Instruments
+    instruments = Instruments()
+    instruments.attach(gameWorld, player, display)
+
 # Uncomment this for a printout of world state at the start
 # utils.printGameState(gameWorld)
 
 # Now run...
 while not(gameWorld.isEnded()):
-    gameWorld.updateTallon(player.makeMove())
-    gameWorld.updateMeanie()
-    gameWorld.updateClock()
-    gameWorld.addMeanie()
-    gameWorld.updateScore()
+    gameWorld.step(player.makeMove())
     display.update()
     # Uncomment this for a printout of world state every step
     # utils.printGameState(gameWorld)
     time.sleep(1)
 
 print("Final score:", gameWorld.getScore())
+
+if instruments != None:
+    instruments.dump(args.instrument)
+    print(instruments.summary())
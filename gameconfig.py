@@ -0,0 +1,99 @@
+# gameconfig.py
+#
+# The configuration of one game, as an object that is handed to World,
+# Tallon and Arena rather than read from the config module while the
+# game runs. That way, differently configured games can run side by
+# side in one process, and a configuration can be sent to another
+# process as it is.
+#
+# The values in config.py are still where the defaults come from:
+#
+#   GameConfig.fromModule()                 # what config.py says now
+#   GameConfig.fromModule(numberOfPits=5)   # the same, with 5 pits
+#
+# A GameConfig can't be changed once it is made; use replace() to get
+# one that differs in some settings. It also works out, once, the
+# values that depend on the settings and are used on every tick.
+
+import config
+from dataclasses import dataclass, field, fields, replace
+
+
+@dataclass(frozen=True)
+class GameConfig():
+
+    # The settings, as described in config.py.
+    worldLength: int
+    worldBreadth: int
+    numberOfMeanies: int
+    numberOfPits: int
+    numberOfBonuses: int
+    dynamic: bool
+    partialVisibility: bool
+    visibilityLimit: float
+    nonDeterministic: bool
+    directionProbability: float
+    senseDistance: float
+    bonusValue: int
+    scoreInterval: int
+    meanieInterval: int
+    useImage: bool
+    winOnLastBonus: bool
+    maxClock: int
+    maxIdleTicks: int
+    fastForward: int
+
+    # Worked out from the settings. Because we index from 0, maxX and
+    # maxY are one less than the number of columns and rows.
+    maxX: int = field(init=False, repr=False, compare=False)
+    maxY: int = field(init=False, repr=False, compare=False)
+    senseDistanceSquared: float = field(init=False, repr=False,
+                                        compare=False)
+    visibilityLimitSquared: float = field(init=False, repr=False,
+                                          compare=False)
+    # The (x, y) offsets within visibilityLimit of (0, 0).
+    visibleOffsets: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        derived = {
+            "maxX": self.worldLength - 1,
+            "maxY": self.worldBreadth - 1,
+            "senseDistanceSquared": self.senseDistance ** 2,
+            "visibilityLimitSquared": self.visibilityLimit ** 2,
+            "visibleOffsets": visibilityOffsets(self.visibilityLimit),
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    # A GameConfig holding the current values in config.py, with any
+    # given changes.
+    @classmethod
+    def fromModule(cls, **changes):
+        values = {name: getattr(config, name) for name in settingNames()}
+        values.update(changes)
+        return cls(**values)
+
+    # A copy with some settings changed.
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+    # The settings as a dictionary.
+    def settings(self):
+        return {name: getattr(self, name) for name in settingNames()}
+
+
+# The names of the settings (rather than the values worked out from
+# them).
+def settingNames():
+    return [f.name for f in fields(GameConfig) if f.init]
+
+
+# The (x, y) offsets that are no further than limit away from (0, 0).
+def visibilityOffsets(limit):
+    reach = int(limit)
+    offsets = []
+    for dx in range(-reach, reach + 1):
+        for dy in range(-reach, reach + 1):
+            if dx * dx + dy * dy <= limit * limit:
+                offsets.append((dx, dy))
+    return tuple(offsets)
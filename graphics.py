@@ -185,8 +185,19 @@ BAD_OPTION = "Illegal option value"
 ##########################################################################
 # global variables and funtions
 
-_root = tk.Tk()
-_root.withdraw()
+# The Tk root window is only made when something needs it (see
+# _getRoot()), so importing this module doesn't need a display.
+_root = None
+
+
+def _getRoot():
+    global _root
+    if _root == None:
+        _root = tk.Tk()
+        _root.withdraw()
+        # MacOS fix 1
+        _root.update()
+    return _root
 
 _update_lasttime = time.time()
 
@@ -202,7 +213,7 @@ def update(rate=None):
         else:
             _update_lasttime = now
 
-    _root.update()
+    _getRoot().update()
 
 ############################################################################
 # Graphics classes start here
@@ -215,7 +226,7 @@ class GraphWin(tk.Canvas):
     def __init__(self, title="Graphics Window",
                  width=200, height=200, autoflush=True):
         assert type(title) == type(""), "Title must be a string"
-        master = tk.Toplevel(_root)
+        master = tk.Toplevel(_getRoot())
         master.protocol("WM_DELETE_WINDOW", self.close)
         tk.Canvas.__init__(self, master, width=width, height=height,
                            highlightthickness=0, bd=0)
@@ -237,7 +248,7 @@ class GraphWin(tk.Canvas):
         master.lift()
         self.lastKey = ""
         if autoflush:
-            _root.update()
+            _getRoot().update()
 
     def __repr__(self):
         if self.isClosed():
@@ -286,7 +297,7 @@ class GraphWin(tk.Canvas):
 
     def __autoflush(self):
         if self.autoflush:
-            _root.update()
+            _getRoot().update()
 
     def plot(self, x, y, color="black"):
         """Set pixel (x,y) to the given color"""
@@ -490,7 +501,7 @@ class GraphicsObject:
         self.id = self._draw(graphwin, self.config)
         graphwin.addItem(self)
         if graphwin.autoflush:
-            _root.update()
+            _getRoot().update()
         return self
 
     def undraw(self):
@@ -503,7 +514,7 @@ class GraphicsObject:
             self.canvas.delete(self.id)
             self.canvas.delItem(self)
             if self.canvas.autoflush:
-                _root.update()
+                _getRoot().update()
         self.canvas = None
         self.id = None
 
@@ -523,7 +534,7 @@ class GraphicsObject:
                 y = dy
             self.canvas.move(self.id, x, y)
             if canvas.autoflush:
-                _root.update()
+                _getRoot().update()
 
     def _reconfig(self, option, setting):
         # Internal method for changing configuration of the object
@@ -536,7 +547,7 @@ class GraphicsObject:
         if self.canvas and not self.canvas.isClosed():
             self.canvas.itemconfig(self.id, options)
             if self.canvas.autoflush:
-                _root.update()
+                _getRoot().update()
 
     def _draw(self, canvas, options):
         """draws appropriate figure on canvas with options provided
@@ -790,7 +801,7 @@ class Entry(GraphicsObject):
         self.anchor = p.clone()
         # print self.anchor
         self.width = width
-        self.text = tk.StringVar(_root)
+        self.text = tk.StringVar(_getRoot())
         self.text.set("")
         self.fill = "gray"
         self.color = "black"
@@ -882,10 +893,10 @@ class Image(GraphicsObject):
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
         if len(pixmap) == 1:  # file name provided
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
+            self.img = tk.PhotoImage(file=pixmap[0], master=_getRoot())
         else:  # width and height provided
             width, height = pixmap
-            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.img = tk.PhotoImage(master=_getRoot(), width=width, height=height)
 
     def __repr__(self):
         return "Image({}, {}, {})".format(self.anchor, self.getWidth(), self.getHeight())
@@ -1009,8 +1020,5 @@ def test():
 # tk.Toplevel(_root).destroy()
 
 
-# MacOS fix 1
-update()
-
 if __name__ == "__main__":
     test()
@@ -0,0 +1,152 @@
+# instrument.py
+#
+# Find out where the time goes in a game.
+#
+#   instruments = Instruments()
+#   instruments.attach(gameWorld, player, display)
+#   ... play the game ...
+#   instruments.dump("timings.json")
+#
+# attach() swaps each of the methods that make up a tick for one that
+# times the call before passing it on:
+#
+#   World.step            the whole tick
+#   World.updateTallon    moving Tallon
+#   World.updateMeanie    moving the Meanies
+#   World.addMeanie       adding a Meanie
+#   World.pickFreePose    finding a free cell for one
+#   World.endCause        checking whether the game is over
+#   Tallon.makeMove       Tallon choosing a move
+#   Arena.update          redrawing the arena
+#
+# For each of these it counts the calls and the total time, and keeps
+# a QuantileSketch (see stats.py) of how long each call took, so that
+# medians and 99th percentiles can be read off.
+#
+# Nothing changes in the classes themselves: the timed methods are put
+# on the objects that were attached, so games that aren't being timed
+# run exactly as fast as before.
+
+import json
+import time
+from stats import QuantileSketch
+
+# What attach() times on each kind of object, and what the phase is
+# called.
+WORLD_PHASES = [("step", "step"), ("updateTallon", "updateTallon"),
+                ("updateMeanie", "updateMeanie"),
+                ("addMeanie", "addMeanie"), ("pickFreePose", "pickFreePose"),
+                ("endCause", "endCause")]
+AGENT_PHASES = [("makeMove", "makeMove")]
+DISPLAY_PHASES = [("update", "Arena.update")]
+
+# The phase that counts as one tick.
+TICK = "step"
+
+
+# The timings of one phase.
+class Phase():
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.latency = QuantileSketch()
+
+    def add(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        self.latency.add(seconds)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.latency.merge(other.latency)
+
+
+class Instruments():
+
+    def __init__(self):
+        self.phases = {}
+
+    # The Phase called name, made if need be.
+    def phase(self, name):
+        phase = self.phases.get(name)
+        if phase == None:
+            phase = Phase()
+            self.phases[name] = phase
+        return phase
+
+    # Time the phases of a world, and optionally the agent playing in
+    # it and the display showing it.
+    def attach(self, world, agent=None, display=None):
+        for method, name in WORLD_PHASES:
+            self.wrap(world, method, name)
+        if agent != None:
+            for method, name in AGENT_PHASES:
+                self.wrap(agent, method, name)
+        if display != None:
+            for method, name in DISPLAY_PHASES:
+                self.wrap(display, method, name)
+
+    # Make calls to obj.method count towards the phase called name.
+    def wrap(self, obj, method, name):
+        call = getattr(obj, method)
+        phase = self.phase(name)
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                phase.add(clock() - start)
+        setattr(obj, method, timed)
+
+    # Add in the timings from other.
+    def merge(self, other):
+        for name, phase in other.phases.items():
+            self.phase(name).merge(phase)
+
+    # How many ticks have been timed.
+    def ticks(self):
+        if TICK not in self.phases:
+            return 0
+        return self.phases[TICK].calls
+
+    # The timings as a dictionary, ready to go to JSON. Times are in
+    # seconds.
+    def toDict(self):
+        ticks = self.ticks()
+        phases = {}
+        for name, phase in self.phases.items():
+            phases[name] = {
+                "calls": phase.calls,
+                "seconds": phase.seconds,
+                "callsPerTick": phase.calls / ticks if ticks else None,
+                "secondsPerTick": phase.seconds / ticks if ticks else None,
+                "p50": phase.latency.quantile(0.5),
+                "p99": phase.latency.quantile(0.99),
+                "max": phase.latency.quantile(1.0),
+            }
+        return {"ticks": ticks, "phases": phases}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.toDict(), f, indent=2)
+            f.write("\n")
+
+    # A table of the timings, one line per phase.
+    def summary(self):
+        ticks = self.ticks()
+        lines = ["{:<14} {:>9} {:>11} {:>10} {:>10} {:>10}".format(
+            "phase", "calls", "us/tick", "p50 us", "p99 us", "max us")]
+        for name, phase in self.phases.items():
+            if phase.calls == 0:
+                continue
+            perTick = phase.seconds / ticks * 1e6 if ticks else 0.0
+            lines.append("{:<14} {:>9} {:>11.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                name, phase.calls, perTick,
+                phase.latency.quantile(0.5) * 1e6,
+                phase.latency.quantile(0.99) * 1e6,
+                phase.latency.quantile(1.0) * 1e6))
+        return "\n".join(lines)
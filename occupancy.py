@@ -0,0 +1,299 @@
+# occupancy.py
+#
+# A per-cell index of what is where in the Mean Arena. World keeps one
+# of these up to date as things move, so that checking whether Tallon
+# has met a Meanie, fallen into a pit or found a bonus, and checking
+# whether a cell is free for a new Meanie, are single lookups rather
+# than scans of the location lists.
+#
+# It also keeps a pool of the cells that are free, so that a free cell
+# can be picked uniformly at random in constant time however crowded
+# the arena gets. The pool is an array of free cells plus, for each
+# cell, its position in that array (or -1 if it is not free). Removing
+# a cell swaps the last entry of the array into its place.
+#
+# Finally it keeps the percept fields: for each cell, how many Meanies,
+# pits and bonuses are next to it (one step away along x or y). A cell
+# next to a Meanie is smelly, one next to a pit is windy, and one next
+# to a bonus glows. These are kept up to date as things move, so
+# asking about any cell is a lookup.
+#
+# Cells are numbered row by row, so the cell at (x, y) is
+# y * (maxX + 1) + x.
+
+import random
+
+
+class Occupancy():
+
+    def __init__(self, maxX, maxY):
+
+        self.maxX = maxX
+        self.maxY = maxY
+        self.width = maxX + 1
+        cells = (maxX + 1) * (maxY + 1)
+
+        # How many Meanies are in each cell. Meanies can share a cell.
+        self.meanies = [0] * cells
+
+        # Which cells hold a pit, and which hold a bonus that has not
+        # been grabbed yet.
+        self.pits = [False] * cells
+        self.bonuses = [False] * cells
+
+        # Cells that stay in use for the whole game, whatever happens:
+        # the pits, and every place a bonus started out (grabbed or
+        # not).
+        self.reserved = [False] * cells
+
+        # The cell Tallon is in, if Tallon has been placed.
+        self.tallon = None
+
+        # The pool of free cells. Everything starts out free.
+        self.free = list(range(cells))
+        self.position = list(range(cells))
+
+        # Percept fields. Pits never move, so windy only changes while
+        # the world is being set up.
+        self.smelly = [0] * cells
+        self.windy = [0] * cells
+        self.glowing = [0] * cells
+
+        # Whether the Meanie counts and smell field, the free pool, and
+        # the bonus and glow fields are still shared with a snapshot
+        # (see Snapshots below).
+        self.sharedMeanies = False
+        self.sharedFree = False
+        self.sharedBonuses = False
+
+        # The cells next to each cell.
+        self.neighbours = []
+        for c in range(cells):
+            x, y = self.coordinates(c)
+            near = []
+            if y > 0:
+                near.append(c - self.width)
+            if y < maxY:
+                near.append(c + self.width)
+            if x < maxX:
+                near.append(c + 1)
+            if x > 0:
+                near.append(c - 1)
+            self.neighbours.append(near)
+
+    # The index of the cell at (x, y).
+    def cell(self, x, y):
+        return y * self.width + x
+
+    # The (x, y) coordinates of a cell.
+    def coordinates(self, c):
+        return c % self.width, c // self.width
+
+    #
+    # Queries
+    #
+
+    def hasMeanie(self, x, y):
+        return self.meanies[y * self.width + x] > 0
+
+    def hasPit(self, x, y):
+        return self.pits[y * self.width + x]
+
+    def hasBonus(self, x, y):
+        return self.bonuses[y * self.width + x]
+
+    # Is the cell at (x, y) next to a Meanie?
+    def isSmelly(self, x, y):
+        return self.smelly[y * self.width + x] > 0
+
+    # Is the cell at (x, y) next to a pit?
+    def isWindy(self, x, y):
+        return self.windy[y * self.width + x] > 0
+
+    # Is the cell at (x, y) next to a bonus that has not been grabbed?
+    def isGlowing(self, x, y):
+        return self.glowing[y * self.width + x] > 0
+
+    # Is the cell at (x, y) already in use? A cell is in use if
+    # Tallon or a Meanie is in it, or if it is reserved.
+    def isTaken(self, x, y):
+        return self.isTakenCell(y * self.width + x)
+
+    # How many cells are free.
+    def freeCount(self):
+        return len(self.free)
+
+    # Pick a free cell uniformly at random, using the random number
+    # generator rng. Returns None if there are no free cells.
+    def pickFree(self, rng=random):
+        if len(self.free) == 0:
+            return None
+        return self.free[rng.randrange(len(self.free))]
+
+    #
+    # Updates
+    #
+
+    def addMeanie(self, x, y):
+        if self.sharedMeanies:
+            self.ownMeanies()
+        c = y * self.width + x
+        self.meanies[c] += 1
+        self.take(c)
+        for n in self.neighbours[c]:
+            self.smelly[n] += 1
+
+    def moveMeanie(self, oldX, oldY, x, y):
+        old = oldY * self.width + oldX
+        c = y * self.width + x
+        if old == c:
+            return
+        if self.sharedMeanies:
+            self.ownMeanies()
+        self.meanies[old] -= 1
+        self.meanies[c] += 1
+        self.take(c)
+        if self.meanies[old] == 0:
+            self.refresh(old)
+        smelly = self.smelly
+        for n in self.neighbours[old]:
+            smelly[n] -= 1
+        for n in self.neighbours[c]:
+            smelly[n] += 1
+
+    def moveTallon(self, x, y):
+        old = self.tallon
+        self.tallon = y * self.width + x
+        self.take(self.tallon)
+        if old is not None and old != self.tallon:
+            self.refresh(old)
+
+    def addPit(self, x, y):
+        c = y * self.width + x
+        self.pits[c] = True
+        self.reserved[c] = True
+        self.take(c)
+        for n in self.neighbours[c]:
+            self.windy[n] += 1
+
+    def addBonus(self, x, y):
+        if self.sharedBonuses:
+            self.ownBonuses()
+        c = y * self.width + x
+        self.bonuses[c] = True
+        self.reserved[c] = True
+        self.take(c)
+        for n in self.neighbours[c]:
+            self.glowing[n] += 1
+
+    # A grabbed bonus leaves the bonus grid, and stops glowing, but
+    # its cell stays reserved.
+    def removeBonus(self, x, y):
+        if self.sharedBonuses:
+            self.ownBonuses()
+        c = y * self.width + x
+        self.bonuses[c] = False
+        for n in self.neighbours[c]:
+            self.glowing[n] -= 1
+
+    # Replace the Meanie counts, the smell field and the free pool
+    # wholesale. Used when all the Meanies have been moved at once.
+    # free and position must describe the same pool, and must agree
+    # with the new counts.
+    def setMeanies(self, meanies, smelly, free, position):
+        self.meanies = meanies
+        self.smelly = smelly
+        self.free = free
+        self.position = position
+        self.sharedMeanies = False
+        self.sharedFree = False
+
+    #
+    # The free pool
+    #
+
+    # Take cell c out of the free pool, if it is there.
+    def take(self, c):
+        i = self.position[c]
+        if i < 0:
+            return
+        if self.sharedFree:
+            self.ownFree()
+        last = self.free.pop()
+        if last != c:
+            self.free[i] = last
+            self.position[last] = i
+        self.position[c] = -1
+
+    # Put cell c back into the free pool if nothing is using it any
+    # more.
+    def refresh(self, c):
+        if self.position[c] >= 0 or self.isTakenCell(c):
+            return
+        if self.sharedFree:
+            self.ownFree()
+        self.position[c] = len(self.free)
+        self.free.append(c)
+
+    # isTaken() for a cell index.
+    def isTakenCell(self, c):
+        return self.meanies[c] > 0 or self.reserved[c] or c == self.tallon
+
+    #
+    # Snapshots
+    #
+    # Only the things that change during a game are kept. Pits,
+    # reserved cells and where it is windy are fixed once the world
+    # has been set up.
+    #
+    # Nothing is copied when a snapshot is taken or restored: the
+    # snapshot and the occupancy share the arrays, and each array is
+    # only copied when the occupancy is about to change it. So a
+    # rollout only pays for copying what it changes, and the bonuses
+    # and what glows, which change rarely, are mostly never copied.
+
+    def snapshot(self):
+        self.share()
+        return (self.meanies, self.bonuses, self.tallon, self.free,
+                self.position, self.smelly, self.glowing)
+
+    def restore(self, snap):
+        (self.meanies, self.bonuses, self.tallon, self.free, self.position,
+         self.smelly, self.glowing) = snap
+        self.share()
+
+    def share(self):
+        self.sharedMeanies = True
+        self.sharedFree = True
+        self.sharedBonuses = True
+
+    # Copy the arrays that are about to change, so that they are no
+    # longer shared with a snapshot.
+
+    def ownMeanies(self):
+        self.meanies = list(self.meanies)
+        self.smelly = list(self.smelly)
+        self.sharedMeanies = False
+
+    def ownFree(self):
+        self.free = list(self.free)
+        self.position = list(self.position)
+        self.sharedFree = False
+
+    def ownBonuses(self):
+        self.bonuses = list(self.bonuses)
+        self.glowing = list(self.glowing)
+        self.sharedBonuses = False
+
+    # An independent copy that shares the fixed parts.
+    def clone(self):
+        other = Occupancy.__new__(Occupancy)
+        other.maxX = self.maxX
+        other.maxY = self.maxY
+        other.width = self.width
+        other.pits = self.pits
+        other.reserved = self.reserved
+        other.windy = self.windy
+        other.neighbours = self.neighbours
+        other.restore(self.snapshot())
+        return other
@@ -0,0 +1,168 @@
+# planner.py
+#
+# Path planning for Tallon, on the grid of the Mean Arena.
+#
+#   planner = Planner(gameWorld.maxX, gameWorld.maxY)
+#   planner.addPits(observation.pits)
+#   target = planner.nearest(observation.tallon, observation.bonuses)
+#   danger = planner.danger(observation.meanies)
+#   direction = planner.direction(observation.tallon, target, danger)
+#
+# For each target (a bonus, say) the planner works out, by a breadth
+# first search out from the target, how many moves it takes to get
+# there from every cell without going through a pit. Pits never move,
+# so the planner remembers every pit it is told about, even once it is
+# out of sight, and each distance field is only worked out the first
+# time it is asked for. The fields are kept until Tallon finds a pit
+# it didn't know about, which only happens when partialVisibility is
+# on.
+#
+# Meanies do move, so they aren't part of the distance fields. Instead
+# danger() marks the cells where a Meanie could be after its next move
+# (its own cell and the ones next to it), and direction() won't step
+# into them. With the field and the danger cells in hand, choosing a
+# move is a handful of lookups.
+#
+# Cells are numbered row by row, as in occupancy.py, so the cell at
+# (x, y) is y * (maxX + 1) + x.
+
+import math
+from collections import deque
+from utils import Directions
+
+# The distance to a cell that can't reach the target.
+UNREACHABLE = math.inf
+
+# The tables made by movesFor(), by the size of the grid.
+MOVES = {}
+
+
+# The moves out of each cell of a grid, as a tuple indexed by cell of
+# (direction, cell) pairs. They are in the order Tallon has always
+# tried them: along x first, then along y. Remember that y increases
+# *down* the grid. Every game on a grid of the same size shares the
+# same table, since it never changes.
+def movesFor(maxX, maxY):
+    moves = MOVES.get((maxX, maxY))
+    if moves != None:
+        return moves
+    width = maxX + 1
+    moves = []
+    for c in range(width * (maxY + 1)):
+        x = c % width
+        y = c // width
+        near = []
+        if x < maxX:
+            near.append((Directions.EAST, c + 1))
+        if x > 0:
+            near.append((Directions.WEST, c - 1))
+        if y > 0:
+            near.append((Directions.NORTH, c - width))
+        if y < maxY:
+            near.append((Directions.SOUTH, c + width))
+        moves.append(tuple(near))
+    moves = tuple(moves)
+    MOVES[(maxX, maxY)] = moves
+    return moves
+
+
+class Planner():
+
+    def __init__(self, maxX, maxY):
+
+        self.maxX = maxX
+        self.maxY = maxY
+        self.width = maxX + 1
+        cells = (maxX + 1) * (maxY + 1)
+
+        # The pits found so far, as a set of Poses and by cell.
+        self.pitPoses = set()
+        self.pits = [False] * cells
+
+        # The distance field for each target, made when first needed.
+        self.fields = {}
+
+        # The moves out of each cell (see movesFor()).
+        self.moves = movesFor(maxX, maxY)
+
+    # The index of the cell at pose.
+    def cell(self, pose):
+        return pose.y * self.width + pose.x
+
+    # Tell the planner about pits (those Tallon can see, say). The
+    # distance fields are only thrown away if any of them are new.
+    def addPits(self, pits):
+        found = False
+        for pit in pits:
+            if pit not in self.pitPoses:
+                self.pitPoses.add(pit)
+                self.pits[self.cell(pit)] = True
+                found = True
+        if found:
+            self.fields = {}
+
+    # How many moves it takes to get from each cell to target, going
+    # round the pits, as a list indexed by cell.
+    def distances(self, target):
+        field = self.fields.get(target)
+        if field == None:
+            field = self.search(self.cell(target))
+            self.fields[target] = field
+        return field
+
+    # A breadth first search out from cell start.
+    def search(self, start):
+        field = [UNREACHABLE] * len(self.pits)
+        field[start] = 0
+        queue = deque([start])
+        while len(queue) > 0:
+            c = queue.popleft()
+            d = field[c] + 1
+            for direction, n in self.moves[c]:
+                if field[n] == UNREACHABLE and not self.pits[n]:
+                    field[n] = d
+                    queue.append(n)
+        return field
+
+    # How many moves it takes to get from pose to target.
+    def distance(self, pose, target):
+        return self.distances(target)[self.cell(pose)]
+
+    # The target that takes fewest moves to get to from pose, or None
+    # if none of them can be reached.
+    def nearest(self, pose, targets):
+        best = None
+        bestDistance = UNREACHABLE
+        for target in targets:
+            distance = self.distance(pose, target)
+            if distance < bestDistance:
+                best = target
+                bestDistance = distance
+        return best
+
+    # The cells a Meanie could be in after its next move, as a set of
+    # cells. Meanies move one step along x or y, so that is their own
+    # cell and the cells next to it.
+    def danger(self, meanies):
+        cells = set()
+        for meanie in meanies:
+            c = self.cell(meanie)
+            cells.add(c)
+            for direction, n in self.moves[c]:
+                cells.add(n)
+        return cells
+
+    # The direction to move from pose to get one step closer to target,
+    # without stepping into a pit or into any of the danger cells. None
+    # if there is no such move (Tallon is there already, the target
+    # can't be reached, or every way forward is dangerous).
+    def direction(self, pose, target, danger=()):
+        field = self.distances(target)
+        c = self.cell(pose)
+        best = None
+        bestDistance = field[c]
+        for direction, n in self.moves[c]:
+            if field[n] < bestDistance and n not in danger:
+                best = direction
+                bestDistance = field[n]
+        return best
@@ -0,0 +1,174 @@
+# replay.py
+#
+# Play back a recorded game (see tracefile.py) in the arena window, at
+# whatever speed you like.
+#
+# run this using:
+#
+# python3 replay.py game.trace
+#
+# Options:
+#
+#   --rate N    play back at N ticks per second (default 5)
+#   --start N   start at tick N
+#   --paused    start paused
+#
+# While it is running:
+#
+#   space       pause or carry on
+#   Right/Left  step one tick forward/back (pauses)
+#   Up/Down     double/halve the playback rate
+#   Home/End    go to the start/end
+#   q           quit
+#
+# When drawing can't keep up with the playback rate, ticks are skipped
+# rather than letting the playback fall behind.
+
+import argparse
+import time
+from tracefile import TraceReader
+
+# The fastest and slowest playback rates, in ticks per second.
+MAX_RATE = 1000.0
+MIN_RATE = 0.25
+
+
+# Stands in for World as far as Arena is concerned, holding the state
+# of the world at one tick of a trace.
+class ReplayWorld():
+
+    def __init__(self, reader):
+        self.maxX = reader.maxX
+        self.maxY = reader.maxY
+        self.show(reader.state(-1))
+
+    # Take on the positions in state (a tracefile.TraceState).
+    def show(self, state):
+        self.tLoc = state.tallon
+        self.mLoc = state.meanies
+        self.bLoc = state.bonuses
+        self.pLoc = state.pits
+        self.score = state.score
+        self.clock = state.clock
+
+
+class Replay():
+
+    def __init__(self, reader, rate=5.0):
+        self.reader = reader
+        self.world = ReplayWorld(reader)
+        self.rate = rate
+        self.paused = False
+
+        # The tick being shown. -1 is the start of the game.
+        self.tick = -1
+
+        # Where the playback clock started: the tick, and the time.
+        self.startTick = -1
+        self.startTime = time.perf_counter()
+
+    # The last tick in the trace.
+    def last(self):
+        return len(self.reader) - 1
+
+    # Show tick i (clamped to the trace).
+    def seek(self, i):
+        i = max(-1, min(i, self.last()))
+        if i != self.tick:
+            self.tick = i
+            self.world.show(self.reader.state(i))
+        self.restartClock()
+
+    # Move by n ticks, and pause.
+    def step(self, n=1):
+        self.paused = True
+        self.seek(self.tick + n)
+
+    def pause(self):
+        self.paused = not self.paused
+        self.restartClock()
+
+    def setRate(self, rate):
+        self.rate = max(MIN_RATE, min(rate, MAX_RATE))
+        self.restartClock()
+
+    # Time playback from the current tick.
+    def restartClock(self):
+        self.startTick = self.tick
+        self.startTime = time.perf_counter()
+
+    # Move on to whichever tick should be showing now. Ticks in
+    # between are skipped, so if drawing takes longer than a tick,
+    # playback jumps ahead rather than falling behind. Returns True if
+    # the tick changed.
+    def advance(self):
+        if self.paused or self.tick >= self.last():
+            return False
+        due = self.startTick + int((time.perf_counter() - self.startTime)
+                                   * self.rate)
+        due = min(due, self.last())
+        if due <= self.tick:
+            return False
+        self.tick = due
+        self.world.show(self.reader.state(due))
+        return True
+
+    # Deal with a key press from the window.
+    def handleKey(self, key):
+        if key == "space":
+            self.pause()
+        elif key == "Right":
+            self.step(1)
+        elif key == "Left":
+            self.step(-1)
+        elif key == "Up":
+            self.setRate(self.rate * 2)
+        elif key == "Down":
+            self.setRate(self.rate / 2)
+        elif key == "Home":
+            self.seek(-1)
+        elif key == "End":
+            self.seek(self.last())
+        return key != "q"
+
+    # Run the playback in display (an Arena showing self.world) until
+    # the window is closed or q is pressed.
+    def run(self, display):
+        shown = None
+        self.restartClock()
+        while not display.pane.isClosed():
+            if not self.handleKey(display.pane.checkKey()):
+                break
+            self.advance()
+            if (self.tick, self.paused, self.rate) != shown:
+                shown = (self.tick, self.paused, self.rate)
+                display.update()
+                display.pane.master.title(
+                    "Mean Arena replay: tick {}/{}, score {}, {:g} ticks/s{}".format(
+                        self.tick + 1, len(self.reader), self.world.score,
+                        self.rate, " (paused)" if self.paused else ""))
+                display.flush()
+            # Don't spin faster than we need to.
+            time.sleep(min(0.01, 0.5 / self.rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a Mean Arena trace")
+    parser.add_argument("trace")
+    parser.add_argument("--rate", type=float, default=5.0)
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--paused", action="store_true")
+    args = parser.parse_args()
+
+    # Only load the graphics once we know there is something to show.
+    from arena import Arena
+
+    reader = TraceReader(args.trace)
+    replay = Replay(reader, args.rate)
+    replay.seek(args.start - 1)
+    replay.paused = args.paused
+    display = Arena(replay.world, autoflush=False)
+    replay.run(display)
+    if not display.pane.isClosed():
+        display.pane.close()
+    reader.close()
@@ -0,0 +1,201 @@
+# results.py
+#
+# Write results to a file as they come in, rather than all at the end.
+#
+#   sink = ResultSink("evaluation.csv")
+#   for result in sweep.run():
+#       sink.write({"score": result.score, ...})
+#   sink.close()
+#
+# Rows are dictionaries, all with the same keys. The format comes from
+# the file name:
+#
+#   .csv      comma separated, with a header line
+#   .jsonl    one JSON object per line
+#   .parquet  Parquet (needs pyarrow: pip install pyarrow)
+#
+# Files are only ever appended to, so running again with the same file
+# adds to what is already there (unless append is False, in which case
+# the file is started afresh when the sink is made). Rows are kept in
+# memory until there are bufferSize of them, or flushInterval seconds
+# have passed, and then written out in one go and (with fsync on) forced onto the disk.
+# If the program is killed, everything up to the last flush is safe.
+# For CSV and JSONL files, a line that was only partly written when
+# that happened is cut off the next time the file is opened.
+#
+# A Parquet file can't be read until it has been closed, and can't be
+# added to, so it doesn't have these guarantees. To get a Parquet file
+# from a long run, write CSV or JSONL and convert it afterwards with
+# toParquet().
+
+import csv
+import io
+import json
+import os
+import time
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+
+# The format for path, from its extension.
+def formatOf(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError("Don't know how to write results to " + path)
+    return FORMATS[extension]
+
+
+class ResultSink():
+
+    def __init__(self, path, bufferSize=64, flushInterval=5.0, fsync=True,
+                 append=True):
+        self.path = path
+        self.format = formatOf(path)
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.rows = []
+        self.fields = None
+        self.lastFlush = time.monotonic()
+        self.count = 0
+
+        if self.format == "parquet":
+            # pyarrow is only needed for Parquet, so only load it now.
+            # A Parquet file is always started afresh.
+            import pyarrow
+            import pyarrow.parquet
+            self.arrow = pyarrow
+            self.parquet = None
+            self.file = None
+            return
+
+        if not append and os.path.exists(path):
+            os.remove(path)
+        repairTail(path)
+        if self.format == "csv":
+            self.fields = readHeader(path)
+        # Binary, so that what gets written is exactly what we encode.
+        self.file = open(path, "ab")
+        self.new = self.file.tell() == 0
+
+    # Add a row.
+    def write(self, row):
+        if self.fields == None:
+            self.fields = list(row)
+        self.rows.append(row)
+        self.count += 1
+        if (len(self.rows) >= self.bufferSize or
+                time.monotonic() - self.lastFlush >= self.flushInterval):
+            self.flush()
+
+    # Write out the rows we are holding.
+    def flush(self):
+        self.lastFlush = time.monotonic()
+        if len(self.rows) == 0:
+            return
+        if self.format == "parquet":
+            self.flushParquet()
+        else:
+            self.file.write(self.encode(self.rows))
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+        self.rows = []
+
+    # The rows as bytes, in the format of the file.
+    def encode(self, rows):
+        if self.format == "jsonl":
+            text = "".join(json.dumps(row) + "\n" for row in rows)
+        else:
+            out = io.StringIO()
+            writer = csv.DictWriter(out, self.fields, lineterminator="\n")
+            if self.new:
+                writer.writeheader()
+                self.new = False
+            writer.writerows(rows)
+            text = out.getvalue()
+        return text.encode("utf-8")
+
+    # Each flush is a row group.
+    def flushParquet(self):
+        table = self.arrow.Table.from_pylist(self.rows)
+        if self.parquet == None:
+            self.parquet = self.arrow.parquet.ParquetWriter(self.path,
+                                                            table.schema)
+        self.parquet.write_table(table)
+
+    def close(self):
+        self.flush()
+        if self.file != None:
+            self.file.close()
+            self.file = None
+        if self.format == "parquet" and self.parquet != None:
+            self.parquet.close()
+            self.parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+# If the CSV or JSONL file at path ends part way through a line (because
+# writing it was interrupted), cut that line off.
+def repairTail(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Look back for the last complete line.
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            chunk = f.read(end - start)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+# The header of an existing CSV file, or None if there isn't one.
+def readHeader(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="") as f:
+        return next(csv.reader(f), None)
+
+
+# The rows in a results file, one at a time. Values in a CSV file come
+# back as strings.
+def readResults(path):
+    format = formatOf(path)
+    if format == "parquet":
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                yield row
+        return
+    with open(path, newline="") as f:
+        if format == "csv":
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+
+# Copy the rows of a CSV or JSONL results file into a Parquet file.
+def toParquet(source, destination, batchSize=65536):
+    with ResultSink(destination, bufferSize=batchSize) as sink:
+        for row in readResults(source):
+            sink.write(row)
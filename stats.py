@@ -0,0 +1,223 @@
+# stats.py
+#
+# Statistics that are kept up to date one value at a time, without
+# holding on to the values.
+#
+#   scores = RunningStats()
+#   for result in results:
+#       scores.add(result.score)
+#   print(scores.mean, scores.halfWidth())
+#
+# The mean and variance use Welford's method, which doesn't lose
+# accuracy the way summing values and their squares does.
+#
+# QuantileSketch does the same for quantiles (medians, 99th
+# percentiles and so on), to within a set relative accuracy, and
+# Summary puts the two together.
+#
+# All of them take the same amount of memory however many values they
+# are given, and two of the same kind can be merged, so partial
+# results (from different processes, say) can be combined without
+# going back to the values.
+
+import math
+from statistics import NormalDist
+
+
+class RunningStats():
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        # The sum of squared differences from the mean.
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # Add in everything other has seen.
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    # The sample variance (0 with fewer than two values).
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def stdev(self):
+        return math.sqrt(self.variance())
+
+    # The standard error of the mean.
+    def standardError(self):
+        if self.count == 0:
+            return math.inf
+        return self.stdev() / math.sqrt(self.count)
+
+    # Half the width of the confidence interval on the mean, using
+    # Student's t distribution. Infinite with fewer than two values.
+    def halfWidth(self, confidence=0.95):
+        if self.count < 2:
+            return math.inf
+        return tQuantile(confidence, self.count - 1) * self.standardError()
+
+
+# The value of Student's t distribution, with df degrees of freedom,
+# that leaves (1 - confidence) / 2 in each tail. For df of 1 and 2
+# there are exact formulas. Otherwise this uses the Cornish-Fisher
+# expansion about the normal distribution. For 95% confidence that is
+# within 1% for df of 3 or more (and within 4% for 99%), but it is too
+# small for df of 1 or 2 (9.71 rather than 12.71 for 95% with df 1),
+# which would make intervals too narrow.
+def tQuantile(confidence, df):
+    p = 0.5 + confidence / 2
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    z2 = z * z
+    return (z + (z2 + 1) * z / (4 * df) +
+            ((5 * z2 + 16) * z2 + 3) * z / (96 * df ** 2) +
+            (((3 * z2 + 19) * z2 + 17) * z2 - 15) * z / (384 * df ** 3))
+
+
+# An estimate of the distribution of a stream of positive values (such
+# as how long something took), from which any quantile can be read.
+#
+# Values are counted in buckets whose bounds go up by a factor of
+# gamma = (1 + accuracy) / (1 - accuracy), as in DDSketch, so every
+# quantile is within accuracy (as a fraction) of the true value. The
+# number of buckets grows with the log of the range of the values, not
+# with how many there are, and two sketches with the same accuracy
+# can be merged.
+class QuantileSketch():
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.logGamma = math.log(self.gamma)
+        self.buckets = {}
+        # Values too small to take the log of.
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 1e-300:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.logGamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Can't merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    # The value with a fraction q (between 0 and 1) of the values below
+    # it, or None if there are no values.
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+# Everything we keep about one set of values (the scores of one
+# configuration, say): a RunningStats and a QuantileSketch.
+class Summary():
+
+    def __init__(self, accuracy=0.01):
+        self.moments = RunningStats()
+        self.sketch = QuantileSketch(accuracy)
+
+    def add(self, value):
+        self.moments.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    # The summary as a dictionary. Everything is None if there are no
+    # values.
+    def row(self, confidence=0.95):
+        m = self.moments
+        if m.count == 0:
+            return dict.fromkeys(SUMMARY_COLUMNS)
+        return {"count": m.count, "total": m.total, "mean": m.mean,
+                "stdev": m.stdev(), "halfWidth": m.halfWidth(confidence),
+                "min": m.min, "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9), "max": m.max}
+
+
+# The keys of Summary.row(), in the order summaryTable() shows them.
+SUMMARY_COLUMNS = ["count", "total", "mean", "stdev", "halfWidth", "min",
+                   "p50", "p90", "max"]
+
+
+# A table of summaries, one line each, headed by labels (a list of
+# strings, one per summary). The quantiles are estimates, to within
+# the accuracy of the sketch.
+def summaryTable(labels, summaries, confidence=0.95):
+    width = max([len(label) for label in labels] + [13])
+    header = "{:<{w}} {:>6} {:>8} {:>8} {:>8} {:>8} {:>6} {:>7} {:>7} {:>6}"
+    line = ("{:<{w}} {count:>6} {total:>8} {mean:>8.2f} {stdev:>8.2f} "
+            "{halfWidth:>8.2f} {min:>6} {p50:>7.1f} {p90:>7.1f} {max:>6}")
+    lines = [header.format("configuration", "games", "total", "mean",
+                           "stdev", "+/-", "min", "median", "p90", "max",
+                           w=width)]
+    for label, summary in zip(labels, summaries):
+        if summary.count == 0:
+            lines.append("{:<{w}} {:>6}".format(label, 0, w=width))
+        else:
+            lines.append(line.format(label, w=width,
+                                     **summary.row(confidence)))
+    return "\n".join(lines)
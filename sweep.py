@@ -0,0 +1,348 @@
+# sweep.py
+#
+# Run many games of the Mean Arena, over many configurations, spread
+# across a pool of worker processes.
+#
+# A sweep is a list of configurations, each one a dictionary of
+# settings from config.py that differ from the defaults, for example:
+#
+#   {"worldLength": 15, "worldBreadth": 15, "numberOfPits": 4}
+#
+# Each configuration is played some number of times. Every game
+# (configuration, episode and seed) is a separate piece of work, and
+# the GameConfig to play it with goes to the worker along with it, so
+# workers never depend on the config module. Results come back as each
+# game finishes.
+#
+# Games are seeded from the sweep's seed and the settings of their
+# configuration, so the same sweep gives the same results however many
+# processes it is run on, and a configuration gets the same games
+# whatever else is in the sweep.
+#
+# Given a ResultCache (see cache.py), games that are already in the
+# cache aren't played again, and every game that is played is added
+# to it. So a sweep that was stopped part way carries on from where it
+# got to, and adding a configuration to a sweep that has been run
+# before only plays the new configuration.
+
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import random
+from collections import namedtuple
+from queue import Queue
+import planner
+import tallon
+from world import World, numpyVersion
+from tallon import Tallon
+from gameconfig import GameConfig
+from cache import configDigest, agentDigest, episodeKey
+from stats import Summary, tQuantile
+from instrument import Instruments
+
+# The grid of configurations used by evaluation.py.
+SIZES = [10, 15, 20]
+PITS = [3, 4, 5]
+BONUSES = [2, 3, 4]
+SPAWNS = [5, 4, 3]
+
+# How many games to play of each configuration, as a range (the
+# number is picked at random from [low, high)).
+EPISODES = (20, 35)
+
+# The modules whose source makes up the agent, for the cache key (see
+# cache.py). Tallon chooses its moves using the planner.
+AGENT_MODULES = [tallon, planner]
+
+
+# The settings a configuration starts from: whatever config.py holds
+# now, except that Tallon always moves the way it chooses to.
+def baseConfig():
+    return GameConfig.fromModule(nonDeterministic=False)
+
+
+# One game to play: which configuration (an index into the sweep's
+# list), which game of that configuration, the seed, the GameConfig to
+# play it with, and whether to time it (see instrument.py).
+WorkUnit = namedtuple('WorkUnit', ['configuration', 'episode', 'seed',
+                                   'config', 'instrument'],
+                      defaults=[False])
+
+# How a game went. cached is True if the game came from the cache
+# rather than being played. instruments holds the timings of the game
+# (an instrument.Instruments) if it was timed.
+EpisodeResult = namedtuple('EpisodeResult', ['configuration', 'episode',
+                                             'seed', 'score', 'clock',
+                                             'cached', 'instruments'],
+                           defaults=[False, None])
+
+
+# The configurations evaluated by evaluation.py, in the order it
+# evaluates them.
+def evaluationGrid():
+    grid = []
+    for size in SIZES:
+        for pits in PITS:
+            for bonuses in BONUSES:
+                for spawn in SPAWNS:
+                    grid.append({"worldLength": size,
+                                 "worldBreadth": size,
+                                 "numberOfPits": pits,
+                                 "numberOfBonuses": bonuses,
+                                 "meanieInterval": spawn})
+    return grid
+
+
+# Play one game and return how it went. This is what runs in the
+# worker processes.
+def runEpisode(unit):
+    gameWorld = World(unit.seed, unit.config)
+    player = Tallon(gameWorld)
+    instruments = None
+    if unit.instrument:
+        instruments = Instruments()
+        instruments.attach(gameWorld, player)
+    done = False
+    while not done:
+        done = gameWorld.step(player.makeMove()).done
+    return EpisodeResult(unit.configuration, unit.episode, unit.seed,
+                         gameWorld.getScore(), gameWorld.getClock(),
+                         False, instruments)
+
+
+class Sweep():
+
+    # configurations is a list of dictionaries of settings. Each one
+    # is played a number of times picked from episodes, using games
+    # seeded from seed. processes is how many worker processes to use:
+    # None for one per CPU, 0 to play everything in this process.
+    # cache, if given, is a ResultCache to take games from and add
+    # them to. With instrument True, games that are played are timed
+    # (games from the cache aren't).
+    def __init__(self, configurations, seed=None, episodes=EPISODES,
+                 processes=None, cache=None, instrument=False):
+        self.setup(configurations, seed, processes, cache, instrument)
+        self.episodes = []
+        self.units = []
+        for index, gameConfig in enumerate(self.gameConfigs):
+            rng = self.streams[index]
+            times = rng.randrange(*episodes)
+            self.episodes.append(times)
+            for episode in range(times):
+                self.units.append(WorkUnit(index, episode,
+                                           rng.getrandbits(64), gameConfig,
+                                           instrument))
+
+    # What every kind of sweep needs: the GameConfig of each
+    # configuration and its random number stream.
+    def setup(self, configurations, seed, processes, cache, instrument):
+        self.configurations = list(configurations)
+        self.instrument = instrument
+        # The scores of each configuration so far (see stats.py).
+        self.summaries = [Summary() for c in self.configurations]
+        if processes == None:
+            processes = os.cpu_count() or 1
+        self.processes = processes
+        self.cache = cache
+        self.agentDigest = agentDigest(AGENT_MODULES)
+        self.numpy = numpyVersion()
+
+        base = baseConfig()
+        self.gameConfigs = [base.replace(**changes)
+                            for changes in self.configurations]
+        self.streams = [configurationRandom(seed, gameConfig)
+                        for gameConfig in self.gameConfigs]
+
+    # The cache key of unit.
+    def key(self, unit):
+        return episodeKey(unit.config, unit.seed, self.agentDigest,
+                          self.numpy)
+
+    # Play every game, yielding an EpisodeResult as each one finishes
+    # (so not necessarily in order). Games in the cache come first.
+    #
+    # self.summaries[i] is kept up to date with the scores of
+    # configuration i as they come in.
+    def run(self):
+        for result in self.results():
+            self.summaries[result.configuration].add(result.score)
+            yield result
+
+    # The results, as run() gives them.
+    def results(self):
+        if self.cache == None:
+            yield from self.play(self.units)
+            return
+
+        keys = {(unit.configuration, unit.episode): self.key(unit)
+                for unit in self.units}
+        known = self.cache.getMany(keys.values())
+        todo = []
+        for unit in self.units:
+            found = known.get(keys[(unit.configuration, unit.episode)])
+            if found == None:
+                todo.append(unit)
+            else:
+                yield EpisodeResult(unit.configuration, unit.episode,
+                                    unit.seed, found[0], found[1], True)
+        try:
+            for result in self.play(todo):
+                self.cache.put(keys[(result.configuration, result.episode)],
+                               result.score, result.clock)
+                yield result
+        finally:
+            self.cache.commit()
+
+    # Play the games in units.
+    def play(self, units):
+        if self.processes == 0 or len(units) == 0:
+            for unit in units:
+                yield runEpisode(unit)
+            return
+        # Hand out work in chunks big enough to keep the overhead down
+        # but small enough to keep every worker busy to the end.
+        chunk = max(1, len(units) // (self.processes * 16))
+        with multiprocessing.Pool(self.processes) as pool:
+            for result in pool.imap_unordered(runEpisode, units, chunk):
+                yield result
+
+
+# A sweep that plays each configuration only as many times as it takes
+# to pin down its mean score.
+#
+# Each configuration is played minEpisodes times to start with. When
+# all of a configuration's games are in, if the confidence interval
+# on its mean score is wider than halfWidth either side, it is played
+# some more: as many more games as its variance so far says it needs,
+# but never more than it has already had (since the variance of a few
+# games is a rough guide), and never more than maxEpisodes in all.
+# Configurations with the most variable scores need the most games,
+# so their games are handed out first; the games every configuration
+# starts with go before any of those.
+#
+# How many games a configuration ends up with isn't known until it is
+# finished: self.episodes[i] is None until then. Each configuration's
+# games depend only on its own results, so the same sweep still gives
+# the same results however many processes it is run on.
+class AdaptiveSweep(Sweep):
+
+    def __init__(self, configurations, seed=None, halfWidth=2.0,
+                 confidence=0.95, minEpisodes=10, maxEpisodes=100,
+                 processes=None, cache=None, instrument=False):
+        self.setup(configurations, seed, processes, cache, instrument)
+        self.halfWidth = halfWidth
+        self.confidence = confidence
+        self.minEpisodes = max(2, minEpisodes)
+        self.maxEpisodes = max(self.minEpisodes, maxEpisodes)
+        self.episodes = [None] * len(self.configurations)
+
+    # Play games, yielding an EpisodeResult as each one finishes, until
+    # every configuration is finished.
+    def run(self):
+        # Games waiting to be played, most variable configuration
+        # first; ties go in the order they were added.
+        queue = []
+        order = itertools.count()
+        # How many games each configuration has waiting or being
+        # played, and how many it has been given so far.
+        outstanding = [0] * len(self.configurations)
+        given = [0] * len(self.configurations)
+
+        def add(index, count, priority):
+            for i in range(count):
+                unit = WorkUnit(index, given[index],
+                                self.streams[index].getrandbits(64),
+                                self.gameConfigs[index], self.instrument)
+                heapq.heappush(queue, (priority, next(order), unit))
+                given[index] += 1
+                outstanding[index] += 1
+
+        for index in range(len(self.configurations)):
+            add(index, self.minEpisodes, -math.inf)
+
+        pool = None
+        if self.processes > 0:
+            pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in self.schedule(queue, pool):
+                index = result.configuration
+                self.summaries[index].add(result.score)
+                outstanding[index] -= 1
+                if outstanding[index] == 0:
+                    more = self.moreEpisodes(index)
+                    if more == 0:
+                        self.episodes[index] = given[index]
+                    else:
+                        add(index, more,
+                            -self.summaries[index].moments.variance())
+                yield result
+        finally:
+            if pool != None:
+                pool.terminate()
+            if self.cache != None:
+                self.cache.commit()
+
+    # How many more games configuration index needs, given the games
+    # it has had.
+    def moreEpisodes(self, index):
+        scores = self.summaries[index].moments
+        if (scores.count >= self.maxEpisodes or
+                scores.halfWidth(self.confidence) <= self.halfWidth):
+            return 0
+        t = tQuantile(self.confidence, scores.count - 1)
+        needed = math.ceil((t * scores.stdev() / self.halfWidth) ** 2)
+        return max(1, min(needed - scores.count, scores.count,
+                          self.maxEpisodes - scores.count))
+
+    # Play the games in queue (a heap of (priority, order, unit)),
+    # which may be added to while this runs, yielding their results.
+    # Only a couple of games per process are handed to pool at a time,
+    # so that games added later still go ahead of less important
+    # ones.
+    def schedule(self, queue, pool):
+        results = Queue()
+        # How many games have been handed out but not yet dealt with.
+        running = 0
+        limit = max(1, 2 * self.processes)
+        # The cache key of each game being played.
+        keys = {}
+        while len(queue) > 0 or running > 0:
+            while len(queue) > 0 and running < limit:
+                unit = heapq.heappop(queue)[2]
+                running += 1
+                found = None
+                if self.cache != None:
+                    key = self.key(unit)
+                    keys[(unit.configuration, unit.episode)] = key
+                    found = self.cache.get(key)
+                if found != None:
+                    results.put(EpisodeResult(unit.configuration,
+                                              unit.episode, unit.seed,
+                                              found[0], found[1], True))
+                elif pool == None:
+                    results.put(runEpisode(unit))
+                else:
+                    pool.apply_async(runEpisode, (unit,),
+                                     callback=results.put,
+                                     error_callback=results.put)
+            result = results.get()
+            running -= 1
+            if isinstance(result, BaseException):
+                raise result
+            if self.cache != None:
+                key = keys.pop((result.configuration, result.episode))
+                if not result.cached:
+                    self.cache.put(key, result.score, result.clock)
+            yield result
+
+
+# The random number stream that decides how many games of the
+# configuration with settings config to play, and their seeds. It
+# depends only on seed and config, not on where the configuration is
+# in the sweep. With no seed, it is different every time.
+def configurationRandom(seed, config):
+    if seed == None:
+        return random.Random()
+    return random.Random("{}:{}".format(seed, configDigest(config)))
@@ -7,14 +7,12 @@
 # Written by: Simon Parsons
 # Last Modified: 12/01/22
 
-import config
 import world
 import random
 import utils
+from planner import Planner
 from utils import Directions, Pose
 
-config.nonDeterministic = None
-
 
 class Tallon():
 
@@ -26,27 +24,40 @@ class Tallon():
     allMeaniesToAvoid = []
     allPits = []
 
-    def __init__(self, arena):
+    def __init__(self, arena, seed=None):
 
         # Make a copy of the world an attribute, so that Tallon can
         # query the state of the world
         self.gameWorld = arena
 
+        # Tallon's own random number stream. By default it is seeded
+        # from the world, so a seeded world gives a repeatable game.
+        if seed == None:
+            seed = arena.agentSeed
+        self.random = random.Random(seed)
+
         # What moves are possible.
         self.moves = [Directions.NORTH, Directions.SOUTH,
                       Directions.EAST, Directions.WEST]
 
+        # The settings of the game being played.
+        self.config = arena.config
+
         # Make the safe distance between Tallon and Meanies
-        if config.partialVisibility:
-            self.safeDistance = config.visibilityLimit / 2
+        if self.config.partialVisibility:
+            self.safeDistance = self.config.visibilityLimit / 2
         else:
-            self.safeDistance = config.senseDistance / 2
+            self.safeDistance = self.config.senseDistance / 2
 
         # if self.safeDistance < 3:
         #     self.safeDistance = 3
 
+        # Finds the way to the bonuses round the pits (see planner.py).
+        self.planner = Planner(arena.maxX, arena.maxY)
+
     # Get the poses were not contained the ban poses
     def filterPoses(self, poses, banPoses=[]):
+        banPoses = set(banPoses)
         filtered = []
         for pose in poses:
             if not utils.containedIn(pose, banPoses):
@@ -55,10 +66,7 @@ class Tallon():
 
     # Get the middle pose in the game world
     def middlePose(self):
-        middlePose = Pose()
-        middlePose.x = self.gameWorld.maxX / 2
-        middlePose.y = self.gameWorld.maxY / 2
-        return middlePose
+        return Pose(self.gameWorld.maxX / 2, self.gameWorld.maxY / 2)
 
     # Choose the best pose from the given poses by avoiding the Bans and earning the closest Bonus
     def chooseTheBestPose(self, poses, bans=[]):
@@ -107,29 +115,25 @@ class Tallon():
         candidatePoses = []
         # Cross offsets
         offsets = [
-            {'x': 0, 'y': +1},  # North
-            {'x': 0, 'y': -1},  # South
-            {'x': +1, 'y': 0},  # Eest
-            {'x': -1, 'y': 0},  # West
+            (0, +1),  # North
+            (0, -1),  # South
+            (+1, 0),  # Eest
+            (-1, 0),  # West
         ]
+        maxX = self.gameWorld.maxX
+        maxY = self.gameWorld.maxY
         for pose in poses:
-            for offset in offsets:
-                candidatePose = Pose()
-                candidatePose.x = pose.x + offset['x']
-                candidatePose.y = pose.y + offset['y']
+            for offsetX, offsetY in offsets:
+                x = pose.x + offsetX
+                y = pose.y + offsetY
                 if (
                     target != None and
                     (pose.x == target.x or pose.y == target.y)
                 ):
-                    candidatePose.x = self.gameWorld.reduceDifference(
-                        pose.x, target.x)
-                    candidatePose.y = self.gameWorld.reduceDifference(
-                        pose.y, target.y)
-                candidatePose.x = utils.checkBounds(
-                    self.gameWorld.maxX, candidatePose.x)
-                candidatePose.y = utils.checkBounds(
-                    self.gameWorld.maxY, candidatePose.y)
-                candidatePoses.append(candidatePose)
+                    x = self.gameWorld.reduceDifference(pose.x, target.x)
+                    y = self.gameWorld.reduceDifference(pose.y, target.y)
+                candidatePoses.append(Pose(utils.checkBounds(maxX, x),
+                                           utils.checkBounds(maxY, y)))
         return candidatePoses
 
     # Get the dangerous poses from the Pits and Meanies
@@ -167,13 +171,12 @@ class Tallon():
 
     # Get the pose was moved by offsetX and offsetY from the given pose
     def offset(self, pose, offsetX=0, offsetY=0):
-        newPose = Pose()
-        newPose.x = utils.checkBounds(self.gameWorld.maxX, pose.x + offsetX)
-        newPose.y = utils.checkBounds(self.gameWorld.maxY, pose.y + offsetY)
-        return newPose
+        return Pose(utils.checkBounds(self.gameWorld.maxX, pose.x + offsetX),
+                    utils.checkBounds(self.gameWorld.maxY, pose.y + offsetY))
 
     # Get the direction between current pose and target pose without ban poses
     def direction(self, bans=[]):
+        bans = set(bans)
         # If not at the same x coordinate, reduce the difference
         if self.targetPose.x > self.currentPose.x and not utils.containedIn(self.offset(self.currentPose, +1, 0), bans):
             return Directions.EAST
@@ -188,16 +191,17 @@ class Tallon():
 
     # Get the direction for travel
     def selfMoveDirection(self):
-        direction = self.moves[random.randint(0, 3)]
+        pits = set(self.allPits)
+        direction = self.moves[self.random.randint(0, 3)]
         # If not at the same x coordinate, reduce the difference
-        if direction == Directions.EAST and not utils.containedIn(self.offset(self.currentPose, +1, 0), self.allPits):
+        if direction == Directions.EAST and not utils.containedIn(self.offset(self.currentPose, +1, 0), pits):
             return Directions.EAST
-        if direction == Directions.WEST and not utils.containedIn(self.offset(self.currentPose, -1, 0), self.allPits):
+        if direction == Directions.WEST and not utils.containedIn(self.offset(self.currentPose, -1, 0), pits):
             return Directions.WEST
         # If not at the same y coordinate, reduce the difference
-        if direction == Directions.NORTH and not utils.containedIn(self.offset(self.currentPose, 0, -1), self.allPits):
+        if direction == Directions.NORTH and not utils.containedIn(self.offset(self.currentPose, 0, -1), pits):
             return Directions.NORTH
-        if direction == Directions.SOUTH and not utils.containedIn(self.offset(self.currentPose, 0, +1), self.allPits):
+        if direction == Directions.SOUTH and not utils.containedIn(self.offset(self.currentPose, 0, +1), pits):
             return Directions.SOUTH
         return None
 
@@ -219,17 +223,20 @@ class Tallon():
         # directly towards any existing bonuses. It ignores Meanies
         # and pits.
         #
+        # Get everything Tallon can see in one go.
+        observation = self.gameWorld.observe()
+
         # Get the location of the Bonuses.
-        self.allBonuses = self.gameWorld.getBonusLocation()
+        self.allBonuses = list(observation.bonuses)
 
         # Get the location of the Tallon.
-        self.currentPose = self.gameWorld.getTallonLocation()
+        self.currentPose = observation.tallon
 
         # Get the location of the Meanies.
-        self.allMeanies = self.gameWorld.getMeanieLocation()
+        self.allMeanies = list(observation.meanies)
 
         # Get the location of the Pits.
-        self.allPits = self.gameWorld.getPitsLocation()
+        self.allPits = list(observation.pits)
 
         self.targetPoseToAvoidMeanies()
 
@@ -241,12 +248,17 @@ class Tallon():
         if foundMeanies and self.targetPose:
             direction = self.direction()
 
-        if direction == None:
-            # if there are still bonuses, move towards the candidate one.
-            allBans = self.banPoses(self.currentPose)
-            if len(self.allBonuses) > 0:
-                self.targetPose = self.closestBonus()
-                direction = self.direction(allBans)
+        if direction == None and len(self.allBonuses) > 0:
+            # if there are still bonuses, move towards the one that
+            # takes fewest moves to reach, going round the pits and
+            # keeping out of reach of the Meanies.
+            self.planner.addPits(self.allPits)
+            self.targetPose = self.planner.nearest(self.currentPose,
+                                                   self.allBonuses)
+            if self.targetPose != None:
+                direction = self.planner.direction(
+                    self.currentPose, self.targetPose,
+                    self.planner.danger(self.allMeanies))
 
         # if there are no meanies to avoid and no candidate bonus, Tallon travels itself.
         if not foundMeanies and direction == None:
@@ -0,0 +1,424 @@
+# tracefile.py
+#
+# A compact binary record of a game, and a way to read it back.
+#
+# TraceRecorder writes one game to a file as World.step() is called:
+#
+#   recorder = TraceRecorder("game.trace")
+#   gameWorld.setRecorder(recorder)
+#   ... play the game with gameWorld.step() ...
+#   recorder.close()
+#
+# TraceReader memory-maps the file, and can give the details of any
+# tick, or the full state of the world after any tick, without
+# replaying the game.
+#
+# The file holds:
+#
+#   a header, giving the size of the world and how many of everything
+#   there is to start with;
+#
+#   the layout at the start: Tallon, the Meanies, the bonuses and the
+#   pits, two bytes (x, y) each;
+#
+#   one record per tick: a fixed-size part (TICK) holding the chosen
+#   and actual directions, flags, Tallon's position, where a Meanie was
+#   added, the score and the clock, followed by how each Meanie moved,
+#   packed two Meanies to a byte. Every keyframeInterval ticks the
+#   record also holds the full list of Meanie positions and which
+#   bonuses are left, so that reading the state at a tick never has
+#   to go back more than keyframeInterval ticks;
+#
+#   an index of where each tick record starts, and a footer saying
+#   where the index is. If the footer is missing (because the game
+#   never finished being written) the reader rebuilds the index by
+#   reading the records in order, stopping at the last whole one.
+#   python3 tracefile.py checks that this works wherever a trace is
+#   cut off.
+#
+# The width and height of the world are single bytes, so worlds can
+# be at most 255 by 255.
+
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+from utils import Pose
+from utils import Directions
+from utils import Cause
+
+MAGIC = b"MATR"
+END = b"MEND"
+VERSION = 1
+
+# magic, version, width, height, Meanies, bonuses, pits, keyframe
+# interval
+HEADER = struct.Struct("<4sHBBHHHH")
+
+# chosen direction, actual direction, flags, cause, Tallon x, Tallon y,
+# new Meanie x, new Meanie y, number of Meanie moves, score, clock
+TICK = struct.Struct("<8BHiI")
+
+# where the index is, number of ticks, magic
+FOOTER = struct.Struct("<QI4s")
+
+# Values of the flags byte
+GRABBED = 1
+DONE = 2
+SPAWNED = 4
+KEYFRAME = 8
+
+# Stands for "no direction" or "no cause".
+NOTHING = 255
+
+# How a Meanie moved on a tick, four bits each.
+STILL = 0
+RIGHT = 1
+LEFT = 2
+DOWN = 3
+UP = 4
+MOVES = {(0, 0): STILL, (1, 0): RIGHT, (-1, 0): LEFT,
+         (0, 1): DOWN, (0, -1): UP}
+OFFSETS = {code: offset for offset, code in MOVES.items()}
+
+DIRECTIONS = {d.value: d for d in Directions}
+CAUSES = {c.value: c for c in Cause}
+
+# What happened on one tick.
+Tick = namedtuple('Tick', ['action', 'motion', 'grabbed', 'done',
+                           'cause', 'tallon', 'spawn', 'score', 'clock'])
+
+# The world as it was after a tick.
+TraceState = namedtuple('TraceState', ['tallon', 'meanies', 'bonuses',
+                                       'pits', 'score', 'clock'])
+
+
+def directionCode(direction):
+    if direction == None:
+        return NOTHING
+    return direction.value
+
+
+class TraceRecorder():
+
+    def __init__(self, path, keyframeInterval=64):
+        self.file = open(path, "wb")
+        self.keyframeInterval = keyframeInterval
+        self.offsets = array("Q")
+        self.position = 0
+
+    # Write the header and the layout of world.
+    def begin(self, world):
+        # The header holds the width and height (maxX + 1 and maxY + 1)
+        # in a byte each.
+        if world.maxX >= 255 or world.maxY >= 255:
+            raise ValueError("World too big to record")
+        self.previous = list(world.mLoc)
+        self.bonuses = list(world.bLoc)
+        self.write(HEADER.pack(MAGIC, VERSION, world.maxX + 1,
+                               world.maxY + 1, len(world.mLoc),
+                               len(world.bLoc), len(world.pLoc),
+                               self.keyframeInterval))
+        layout = bytearray()
+        for pose in [world.tLoc] + world.mLoc + world.bLoc + world.pLoc:
+            layout += bytes((pose.x, pose.y))
+        self.write(layout)
+
+    # Write the record for the tick that has just happened.
+    def record(self, world, direction, result):
+        self.offsets.append(self.position)
+        tick = len(self.offsets)
+        moved = len(self.previous)
+
+        flags = 0
+        if result.grabbed:
+            flags |= GRABBED
+        if result.done:
+            flags |= DONE
+        spawn = (NOTHING, NOTHING)
+        if len(world.mLoc) > moved:
+            flags |= SPAWNED
+            spawn = world.mLoc[moved]
+        keyframe = tick % self.keyframeInterval == 0
+        if keyframe:
+            flags |= KEYFRAME
+        cause = NOTHING
+        if result.cause != None:
+            cause = result.cause.value
+
+        data = bytearray(TICK.pack(
+            directionCode(direction), directionCode(world.motion), flags,
+            cause, world.tLoc.x, world.tLoc.y, spawn[0], spawn[1], moved,
+            world.score, world.clock))
+
+        # Meanie moves, two to a byte.
+        packed = bytearray((moved + 1) // 2)
+        current = world.mLoc
+        for i in range(moved):
+            old = self.previous[i]
+            new = current[i]
+            code = MOVES[(new.x - old.x, new.y - old.y)]
+            packed[i >> 1] |= code << ((i & 1) * 4)
+        data += packed
+
+        if keyframe:
+            data += struct.pack("<H", len(current))
+            for pose in current:
+                data += bytes((pose.x, pose.y))
+            live = set(world.bLoc)
+            data += bytes(1 if b in live else 0 for b in self.bonuses)
+
+        self.write(data)
+        self.previous = list(current)
+
+    # Write the index and footer, and close the file.
+    def close(self):
+        if self.file == None:
+            return
+        start = self.position
+        self.write(self.offsets.tobytes())
+        self.write(FOOTER.pack(start, len(self.offsets), END))
+        self.file.close()
+        self.file = None
+
+    def write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+
+class TraceReader():
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.width, self.height, meanies, bonuses, pits,
+         self.keyframeInterval) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a Mean Arena trace: " + path)
+        self.maxX = self.width - 1
+        self.maxY = self.height - 1
+
+        # The layout at the start
+        poses = []
+        offset = HEADER.size
+        for i in range(1 + meanies + bonuses + pits):
+            poses.append(Pose(self.data[offset], self.data[offset + 1]))
+            offset += 2
+        self.tallon = poses[0]
+        self.meanies = poses[1:1 + meanies]
+        self.bonuses = poses[1 + meanies:1 + meanies + bonuses]
+        self.pits = poses[1 + meanies + bonuses:]
+        self.start = offset
+
+        self.offsets = self.readIndex()
+
+    # The index from the footer if there is one, otherwise built by
+    # walking through the records.
+    #
+    # A trace whose writer died while writing the index or footer has
+    # part of an index after the last record, which could be read as
+    # more records. So each record has to follow on from the one
+    # before: see follows().
+    def readIndex(self):
+        if len(self.data) >= self.start + FOOTER.size:
+            where, ticks, end = FOOTER.unpack_from(
+                self.data, len(self.data) - FOOTER.size)
+            if end == END and where + 8 * ticks + FOOTER.size == len(self.data):
+                offsets = array("Q")
+                offsets.frombytes(self.data[where:where + 8 * ticks])
+                return offsets
+
+        offsets = array("Q")
+        offset = self.start
+        meanies = len(self.meanies)
+        clock = -1
+        while offset + TICK.size <= len(self.data):
+            fields = TICK.unpack_from(self.data, offset)
+            if not self.follows(fields, len(offsets), meanies, clock):
+                break
+            size = self.recordSize(offset)
+            if size == None or offset + size > len(self.data):
+                break
+            offsets.append(offset)
+            offset += size
+            flags = fields[2]
+            meanies = fields[8] + (1 if flags & SPAWNED else 0)
+            clock = fields[10]
+            # Nothing is recorded after the game ends.
+            if flags & DONE:
+                break
+        return offsets
+
+    # Whether fields, read as the record of tick i, can follow a tick
+    # that left the given number of Meanies and the given clock. The
+    # record must move every Meanie there was, the clock must have
+    # gone up, only known flags can be set, and the record must be a
+    # keyframe exactly when tick i should be.
+    def follows(self, fields, i, meanies, clock):
+        flags = fields[2]
+        if flags & ~(GRABBED | DONE | SPAWNED | KEYFRAME):
+            return False
+        keyframe = (i + 1) % self.keyframeInterval == 0
+        return (fields[8] == meanies and fields[10] > clock and
+                bool(flags & KEYFRAME) == keyframe)
+
+    # How many bytes the record at offset takes up, or None if the file
+    # stops before that can be worked out (part way through writing a
+    # keyframe, before the Meanie count).
+    def recordSize(self, offset):
+        fields = TICK.unpack_from(self.data, offset)
+        flags = fields[2]
+        moved = fields[8]
+        size = TICK.size + (moved + 1) // 2
+        if flags & KEYFRAME:
+            if offset + size + 2 > len(self.data):
+                return None
+            (count,) = struct.unpack_from("<H", self.data, offset + size)
+            size += 2 + 2 * count + len(self.bonuses)
+        return size
+
+    # How many ticks were recorded
+    def __len__(self):
+        return len(self.offsets)
+
+    # What happened on tick i (counting from 0).
+    def tick(self, i):
+        (action, motion, flags, cause, tX, tY, sX, sY, moved, score,
+         clock) = TICK.unpack_from(self.data, self.offsets[i])
+        spawn = None
+        if flags & SPAWNED:
+            spawn = Pose(sX, sY)
+        return Tick(DIRECTIONS.get(action), DIRECTIONS.get(motion),
+                    bool(flags & GRABBED), bool(flags & DONE),
+                    CAUSES.get(cause), Pose(tX, tY), spawn, score, clock)
+
+    # The state of the world after tick i, or at the start if i is -1.
+    #
+    # Starts from the nearest keyframe at or before tick i (or the
+    # start) and applies the Meanie moves from there.
+    def state(self, i):
+        if i < -1 or i >= len(self.offsets):
+            raise IndexError("No tick {} in trace".format(i))
+        first = i
+        while first >= 0 and not self.isKeyframe(first):
+            first -= 1
+
+        if first < 0:
+            meanies = list(self.meanies)
+            live = [True] * len(self.bonuses)
+            score = 0
+            clock = 0
+            tallon = self.tallon
+        else:
+            meanies, live = self.keyframe(first)
+            tick = self.tick(first)
+            score = tick.score
+            clock = tick.clock
+            tallon = tick.tallon
+
+        for t in range(first + 1, i + 1):
+            tick = self.tick(t)
+            meanies = self.applyMoves(t, meanies)
+            if tick.spawn != None:
+                meanies.append(tick.spawn)
+            if tick.grabbed:
+                live[self.bonuses.index(tick.tallon)] = False
+            score = tick.score
+            clock = tick.clock
+            tallon = tick.tallon
+
+        bonuses = [b for b, alive in zip(self.bonuses, live) if alive]
+        return TraceState(tallon, meanies, bonuses, list(self.pits),
+                          score, clock)
+
+    def isKeyframe(self, i):
+        return bool(self.data[self.offsets[i] + 2] & KEYFRAME)
+
+    # The Meanie positions and live bonuses stored with tick i.
+    def keyframe(self, i):
+        offset = self.offsets[i]
+        moved = TICK.unpack_from(self.data, offset)[8]
+        offset += TICK.size + (moved + 1) // 2
+        (count,) = struct.unpack_from("<H", self.data, offset)
+        offset += 2
+        meanies = []
+        for j in range(count):
+            meanies.append(Pose(self.data[offset], self.data[offset + 1]))
+            offset += 2
+        live = [b == 1 for b in self.data[offset:offset + len(self.bonuses)]]
+        return meanies, live
+
+    # Apply the Meanie moves of tick i to meanies.
+    def applyMoves(self, i, meanies):
+        offset = self.offsets[i]
+        moved = TICK.unpack_from(self.data, offset)[8]
+        packed = self.data[offset + TICK.size:
+                           offset + TICK.size + (moved + 1) // 2]
+        result = []
+        for j in range(moved):
+            dx, dy = OFFSETS[(packed[j >> 1] >> ((j & 1) * 4)) & 15]
+            pose = meanies[j]
+            result.append(Pose(pose.x + dx, pose.y + dy))
+        return result
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# Check that a trace cut off anywhere near its end (as when the program
+# writing it is killed) can still be read, up to the last whole tick,
+# and that it gives the same state there as the whole trace does.
+# Records games with a short keyframe interval, so that plenty of the
+# cut points fall inside keyframes.
+def checkTruncated(games=20, tail=40, keyframeInterval=4):
+    import os
+    import tempfile
+    from world import World
+    from tallon import Tallon
+
+    folder = tempfile.mkdtemp()
+    full = os.path.join(folder, "full.trace")
+    cut = os.path.join(folder, "cut.trace")
+    checked = 0
+    for seed in range(games):
+        recorder = TraceRecorder(full, keyframeInterval)
+        gameWorld = World(seed)
+        gameWorld.setRecorder(recorder)
+        player = Tallon(gameWorld)
+        while not gameWorld.step(player.makeMove()).done:
+            pass
+        recorder.close()
+
+        reader = TraceReader(full)
+        ticks = len(reader)
+        end = reader.offsets[-1] + reader.recordSize(reader.offsets[-1])
+        with open(full, "rb") as f:
+            data = f.read()
+        # Cut in the last few records, and anywhere in the index and
+        # footer (as when the writer dies while closing the file).
+        for size in range(max(end - tail, HEADER.size + 1), len(data)):
+            with open(cut, "wb") as f:
+                f.write(data[:size])
+            short = TraceReader(cut)
+            if len(short) > ticks or (size >= end and len(short) != ticks):
+                raise AssertionError("Seed {} cut at {}: {} ticks of {}".format(
+                    seed, size, len(short), ticks))
+            if len(short) > 0:
+                last = len(short) - 1
+                if short.state(last) != reader.state(last):
+                    raise AssertionError("Seed {} cut at {}: wrong state".format(
+                        seed, size))
+            short.close()
+            checked += 1
+        reader.close()
+    os.remove(full)
+    os.remove(cut)
+    os.rmdir(folder)
+    return checked
+
+
+# python3 tracefile.py checks that cut off traces can be read.
+if __name__ == "__main__":
+    print("Read {} cut off traces".format(checkTruncated()))
@@ -8,6 +8,7 @@
 
 import random
 import math
+from collections import namedtuple
 from enum import Enum
 
 # Representation of directions
@@ -26,18 +27,60 @@ class State(Enum):
     PLAY = 0
     WON = 1
     LOST = 2
+    # Ended by a limit (see maxClock and maxIdleTicks in config.py).
+    STOPPED = 3
+
+# Why a game ended
+
+
+class Cause(Enum):
+    MEANIE = 0
+    PIT = 1
+    BONUSES = 2   # Tallon grabbed the last bonus
+    CLOCK = 3     # The clock got to maxClock
+    IDLE = 4      # Tallon didn't move for maxIdleTicks ticks
 
 # Class to represent the position of elements within the game
 #
+# A Pose is a value: it can't be changed once it is made, two Poses
+# with the same x and y are equal, and Poses can be used in sets and
+# as dictionary keys. To move something, make a new Pose, either with
+# Pose(x, y) or with pose._replace(x=...). Being a tuple with no
+# per-instance dictionary also keeps them small.
 
 
-class Pose():
-    x = 0
-    y = 0
+class Pose(namedtuple('Pose', ['x', 'y'], defaults=[0, 0])):
+    __slots__ = ()
 
     def print(self):
         print('[', self.x, ',', self.y, ']')
 
+# What Tallon can see of the world at one point in time, as returned
+# by World.observe(). The location fields are tuples of Poses, already
+# filtered by the visibility limit; the percept fields say whether
+# Tallon's cell is smelly, windy or glowing. Like a Pose, an
+# Observation can't be changed.
+
+
+class Observation(namedtuple('Observation', [
+        'tallon', 'meanies', 'bonuses', 'pits', 'clock', 'score',
+        'grabbed', 'smelly', 'windy', 'glowing'])):
+    __slots__ = ()
+
+# What happened in one tick of the game, as returned by World.step().
+# done says whether the game is over, and if it is, cause says why (a
+# Cause). reward is how much the score went up during the tick,
+# grabbed says whether Tallon grabbed a bonus, and clock is the clock
+# value at the end of the tick. ticks is how many ticks the step took,
+# which is only ever more than 1 when the world fast-forwards (see
+# World.fastForward()).
+
+
+class StepResult(namedtuple('StepResult', [
+        'done', 'cause', 'reward', 'grabbed', 'clock', 'ticks'],
+        defaults=[1])):
+    __slots__ = ()
+
 # Check if two game elements are in the same location
 
 
@@ -69,44 +112,42 @@ def checkBounds(max, dimension):
 
 # Pick a location in the range [0, x] and [0, y]
 #
-# Used to randomize the initial conditions.
-
+# Used to randomize the initial conditions. rng is the random number
+# generator to use (a random.Random, or the random module itself).
 
-def pickRandomPose(x, y):
-    p = Pose()
-    p.x = random.randint(0, x)
-    p.y = random.randint(0, y)
 
-    return p
+def pickRandomPose(x, y, rng=random):
+    return Pose(rng.randint(0, x), rng.randint(0, y))
 
 # Pick a unique location, in the range [0, x] and [0, y], given a list
-# of locations that have already been chosen.
-
-
-def pickUniquePose(x, y, taken):
-    uniqueChoice = False
-    while(not uniqueChoice):
-        candidatePose = pickRandomPose(x, y)
-        # Don't seem to be able to use 'in' here. I suspect it is
-        # because of the way __contains__ checks for equality.
-        if not containedIn(candidatePose, taken):
-            uniqueChoice = True
-    return candidatePose
+# of locations that have already been chosen. Returns None if every
+# location has been chosen.
+#
+# This picks uniformly from the locations that are left, rather than
+# drawing random locations until one is not taken, so it takes the
+# same time however many locations are taken. (World keeps its own
+# pool of free locations, see occupancy.py.)
+
+
+def pickUniquePose(x, y, taken, rng=random):
+    taken = set(taken)
+    free = []
+    for i in range(x + 1):
+        for j in range(y + 1):
+            if Pose(i, j) not in taken:
+                free.append(Pose(i, j))
+    if len(free) == 0:
+        return None
+    return free[rng.randrange(len(free))]
 
 # Check if a pose with the same x and y is already in poseList.
 #
-# There should be a way to do this with in/__contains__ by overloading
-# the relevant equality operator for pose, but that is for another
-# time.
+# Poses compare by value, so this is just 'in'. Passing a set rather
+# than a list makes it a constant-time check.
 
 
 def containedIn(pose, poseList):
-    contained = False
-    for poses in poseList:
-        if sameLocation(pose, poses):
-            contained = True
-            #print(pose, "and", poses, "are (both) at (", pose.x, ",", pose.y, ") and (", pose.x, ", ", pose.y, ")")
-    return contained
+    return pose in poseList
 
 # Print out game state information. Not so useful given the graphical
 # display, but might come in handy. Note that what is printed is
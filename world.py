@@ -9,54 +9,118 @@
 #
 # Thanks to Ethan Henderson for tracking down several bugs.
 
+import itertools
 import random
-import config
 import utils
 from utils import Pose
 from utils import Directions
 from utils import State
+from utils import Observation
+from utils import StepResult
+from utils import Cause
+from occupancy import Occupancy
+from gameconfig import GameConfig
+from events import NULL_SINK, Tick, BonusGrabbed, MeanieAdded, GameEnded
+
+# numpy is only used to move large numbers of Meanies at once (see
+# updateMeanie()), so it is only loaded the first time that happens,
+# rather than slowing down every program that plays a game. Without
+# it, Meanies are moved one at a time.
+np = None
+numpyMissing = False
+
+
+# Is numpy there to use? Loads it if need be.
+def haveNumpy():
+    global np, numpyMissing
+    if np == None and not numpyMissing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            numpyMissing = True
+    return np != None
+
+
+# The version of numpy that moves large numbers of Meanies, or None if
+# there is no numpy. A seeded game only plays out the same way again
+# with the same answer, since with numpy the Meanies draw different
+# random numbers (see updateMeanieVectorized()).
+def numpyVersion():
+    if not haveNumpy():
+        return None
+    return np.__version__
+
+
+# The random number streams, in the order snapshots hold them.
+LAYOUT = 0
+MEANIE = 1
+MOTION = 2
 
 
 class World():
 
-    def __init__(self):
+    # With at least this many Meanies, and numpy available, the
+    # Meanies are all moved at once using numpy.
+    vectorThreshold = 128
+
+    # config is the GameConfig to play with; by default, whatever
+    # config.py says when the world is made.
+    def __init__(self, seed=None, config=None):
+        if config == None:
+            config = GameConfig.fromModule()
+        self.config = config
+
+        # Random number streams. Each part of the game draws from its
+        # own stream, all of them derived from seed, so that a game
+        # with a given seed always plays out the same way, whatever
+        # else is using the random module. layoutRandom places things
+        # (at the start and when Meanies are added), meanieRandom
+        # moves the Meanies, and motionRandom decides when Tallon's
+        # moves go astray. agentSeed is there for whatever controls
+        # Tallon. With no seed, every game is different. Once there
+        # are vectorThreshold Meanies, the same seed only gives the
+        # same game with the same numpy (see numpyVersion()).
+        self.waiting = [None, None, None]
+        self.reseed(seed)
 
         # Import boundaries of the world. because we index from 0,
         # these are one less than the number of rows and columns.
-        self.maxX = config.worldLength - 1
-        self.maxY = config.worldBreadth - 1
+        self.maxX = config.maxX
+        self.maxY = config.maxY
 
-        # Keep a list of locations that have been used.
-        self.locationList = []
+        # Keep track of what is in each cell, so that we can check
+        # for collisions, bonuses and free cells without searching.
+        self.cells = Occupancy(self.maxX, self.maxY)
+        if (config.numberOfMeanies + 1 + config.numberOfBonuses +
+                config.numberOfPits) > self.cells.freeCount():
+            raise ValueError("Too many objects for the size of the world")
 
         # Add the initial set of Meanies
         self.mLoc = []
         for i in range(config.numberOfMeanies):
-            newLoc = utils.pickUniquePose(
-                self.maxX, self.maxY, self.locationList)
+            newLoc = self.pickFreePose()
             self.mLoc.append(newLoc)
-            self.locationList.append(newLoc)
+            self.cells.addMeanie(newLoc.x, newLoc.y)
 
         # Add Tallon
-        newLoc = utils.pickUniquePose(self.maxX, self.maxY, self.locationList)
+        newLoc = self.pickFreePose()
         self.tLoc = newLoc
-        self.locationList.append(newLoc)
+        self.cells.moveTallon(newLoc.x, newLoc.y)
 
         # Add Bonuses
         self.bLoc = []
         for i in range(config.numberOfBonuses):
-            newLoc = utils.pickUniquePose(
-                self.maxX, self.maxY, self.locationList)
+            newLoc = self.pickFreePose()
             self.bLoc.append(newLoc)
-            self.locationList.append(newLoc)
+            self.cells.addBonus(newLoc.x, newLoc.y)
 
         # Pits
         self.pLoc = []
         for i in range(config.numberOfPits):
-            newLoc = utils.pickUniquePose(
-                self.maxX, self.maxY, self.locationList)
+            newLoc = self.pickFreePose()
             self.pLoc.append(newLoc)
-            self.locationList.append(newLoc)
+            self.cells.addPit(newLoc.x, newLoc.y)
 
         # Game state
         self.status = State.PLAY
@@ -70,15 +134,55 @@ class World():
         # Did Tallon just successfully grab a bonus?
         self.grabbed = False
 
+        # How many ticks in a row Tallon has not tried to move.
+        self.idle = 0
+
+        # The direction Tallon actually moved in on the last tick,
+        # which is not always the one they chose (see
+        # probabilisticMotion()).
+        self.motion = None
+
+        # Something to record each step() to, if anything (see
+        # tracefile.py).
+        self.recorder = None
+
+        # Where to tell about what happens (see events.py). By default,
+        # nowhere.
+        self.events = NULL_SINK
+
+        # What Tallon can see, worked out at most once per tick (see
+        # observe()).
+        self.observation = None
+
+        # Which cells Tallon can see from each cell, as a mask over
+        # the cells. Built as Tallon visits each cell, from the list
+        # of offsets that are within the visibility limit.
+        self.visibility = {}
+
     #
     # Access Methods
     #
     # These are the functions that should be used by Tallon to access
     # information about the world.
 
+    # Everything Tallon can see, in one go. See utils.Observation.
+    def observe(self):
+        if self.observation == None:
+            visible = self.visibleCells()
+            self.observation = Observation(
+                self.tLoc,
+                self.filterVisible(self.mLoc, visible),
+                self.filterVisible(self.bLoc, visible),
+                self.filterVisible(self.pLoc, visible),
+                self.clock, self.score, self.grabbed,
+                self.cells.isSmelly(self.tLoc.x, self.tLoc.y),
+                self.cells.isWindy(self.tLoc.x, self.tLoc.y),
+                self.cells.isGlowing(self.tLoc.x, self.tLoc.y))
+        return self.observation
+
     # Where is/are the Meanies?
     def getMeanieLocation(self):
-        return self.distanceFiltered(self.mLoc)
+        return list(self.observe().meanies)
 
     # Where is Tallon?
     def getTallonLocation(self):
@@ -86,11 +190,11 @@ class World():
 
     # Where are the Bonuses?
     def getBonusLocation(self):
-        return self.distanceFiltered(self.bLoc)
+        return list(self.observe().bonuses)
 
     # Where are the Pits?
     def getPitsLocation(self):
-        return self.distanceFiltered(self.pLoc)
+        return list(self.observe().pits)
 
     # Clock value
     def getClock(self):
@@ -126,81 +230,202 @@ class World():
     # These are the functions that are used to update and report on
     # world information.
 
+    # Has the game ended? (To see the messages this used to print,
+    # use an events.PrintSink.)
     def isEnded(self):
-        dead = False
-        won = False
+        return self.endCause() != None
+
+    # Has the game ended, and if so why? Returns a Cause, or None if
+    # the game is still going, and updates the game state to match.
+    # The first time it finds the game has ended, it sends a GameEnded
+    # event.
+    def endCause(self):
+        playing = self.status == State.PLAY
+        cause = self.checkEnd()
+        if cause != None and playing and self.events.enabled:
+            self.events.emit(GameEnded(self.clock, self.score, cause))
+        return cause
+
+    # The work of endCause().
+    def checkEnd(self):
+        x = self.tLoc.x
+        y = self.tLoc.y
         # Has Tallon met a Meanie?
-        for i in range(len(self.mLoc)):
-            if utils.sameLocation(self.tLoc, self.mLoc[i]):
-                print("Oops! Met a Meanie")
-                dead = True
-                self.status = State.LOST
+        if self.cells.hasMeanie(x, y):
+            self.status = State.LOST
+            return Cause.MEANIE
 
         # Did Tallon fall in a Pit?
-        for i in range(len(self.pLoc)):
-            if utils.sameLocation(self.tLoc, self.pLoc[i]):
-                print("Arghhhhh! Fell in a pit")
-                dead = True
-                self.status = State.LOST
+        if self.cells.hasPit(x, y):
+            self.status = State.LOST
+            return Cause.PIT
 
         # Did Tallon grab all the bonuses?
-        if len(self.bLoc) == 0:
-            self.status
-            # Right now this does not trigger anything in terms of game state.
-            #print("Got the last bonus!")
-
-        if dead == True:
-            print("Game Over!")
-            return True
+        if (self.config.winOnLastBonus and len(self.bLoc) == 0 and
+                self.config.numberOfBonuses > 0):
+            self.status = State.WON
+            return Cause.BONUSES
+
+        # Has the game gone on too long?
+        if self.config.maxClock > 0 and self.clock >= self.config.maxClock:
+            self.status = State.STOPPED
+            return Cause.CLOCK
+
+        # Has Tallon stopped playing?
+        if (self.config.maxIdleTicks > 0 and
+                self.idle >= self.config.maxIdleTicks):
+            self.status = State.STOPPED
+            return Cause.IDLE
+
+        return None
+
+    # Run one tick of the game with Tallon trying to move in the given
+    # direction, and report what happened as a StepResult.
+    #
+    # This is the same sequence of updates as calling updateTallon(),
+    # updateMeanie(), updateClock(), addMeanie() and updateScore()
+    # and then isEnded(), which is what game.py used to do, but in one
+    # call, and without isEnded()'s messages.
+    #
+    # If fastForward is set in the config and Tallon doesn't try to
+    # move, the step may take more than one tick (see fastForward()).
+    def step(self, direction):
+        before = self.score
+        self.updateTallon(direction)
+        self.updateMeanie()
+        self.clock += 1
+        if (self.clock % self.config.meanieInterval) == 0:
+            self.addMeanie()
+        if (self.clock % self.config.scoreInterval) == 0:
+            self.score += 1
+        self.observation = None
+        cause = self.endCause()
+        ticks = 1
+        if (cause == None and direction == None and
+                self.config.fastForward > 0 and self.recorder == None):
+            ticks += self.fastForward(self.config.fastForward)
+            cause = self.endCause()
+        result = StepResult(cause != None, cause, self.score - before,
+                            self.grabbed, self.clock, ticks)
+        if self.events.enabled:
+            self.events.emit(Tick(self.clock, self.score, ticks))
+        if self.recorder != None:
+            self.recorder.record(self, direction, result)
+        return result
+
+    # Run on for up to limit more ticks with Tallon standing still,
+    # as long as that can't end the game, and return how many ticks
+    # that was.
+    #
+    # Each Meanie moves at most one cell a tick, so none can reach
+    # Tallon in fewer ticks than its Manhattan distance from Tallon.
+    # We stop short of that, of the next tick a Meanie is added, and
+    # of the clock and idle limits, so the game can't end and nothing
+    # new can appear. Over those ticks only the Meanies move; the
+    # clock and score are moved on in one go. Tallon's motion is
+    # still drawn each tick, so the game goes exactly as it would have
+    # if Tallon had been asked for a move every tick and said None.
+    def fastForward(self, limit):
+        if len(self.mLoc) > 0:
+            x = self.tLoc.x
+            y = self.tLoc.y
+            nearest = min(abs(m.x - x) + abs(m.y - y) for m in self.mLoc)
+            limit = min(limit, nearest - 1)
+        interval = self.config.meanieInterval
+        limit = min(limit, interval - self.clock % interval - 1)
+        if self.config.maxClock > 0:
+            limit = min(limit, self.config.maxClock - self.clock - 1)
+        if self.config.maxIdleTicks > 0:
+            limit = min(limit, self.config.maxIdleTicks - self.idle - 1)
+        if limit <= 0:
+            return 0
+
+        for i in range(limit):
+            self.probabilisticMotion(None)
+            self.updateMeanie()
+        interval = self.config.scoreInterval
+        self.score += ((self.clock + limit) // interval -
+                       self.clock // interval)
+        self.clock += limit
+        self.idle += limit
+        self.motion = None
+        self.grabbed = False
+        self.observation = None
+        return limit
+
+    # Send events to sink from now on (see events.py). Pass None to
+    # stop.
+    def setEventSink(self, sink):
+        if sink == None:
+            sink = NULL_SINK
+        self.events = sink
+
+    # Record every step() from now on to recorder, which is sent the
+    # world as it is now, then the world, the chosen direction and the
+    # StepResult after every step. Pass None to stop recording.
+    def setRecorder(self, recorder):
+        self.recorder = recorder
+        if recorder != None:
+            recorder.begin(self)
 
     # Implements the move chosen by Tallon
     def updateTallon(self, direction):
         # Set the bonus grabbed flag to False
         # Correction due to Rachel Trimble here
         self.grabbed = False
+        self.observation = None
+        if direction == None:
+            self.idle += 1
+        else:
+            self.idle = 0
         # Implement non-determinism if appropriate
         direction = self.probabilisticMotion(direction)
+        self.motion = direction
         # Note that y increases *down* the grid. Correction due to
         # Ethan Henderson and Negar Pourmoazemi here.
+        x = self.tLoc.x
+        y = self.tLoc.y
         if direction == Directions.SOUTH:
-            if self.tLoc.y < self.maxY:
-                self.tLoc.y = self.tLoc.y + 1
+            if y < self.maxY:
+                y = y + 1
 
         if direction == Directions.NORTH:
-            if self.tLoc.y > 0:
-                self.tLoc.y = self.tLoc.y - 1
+            if y > 0:
+                y = y - 1
 
         if direction == Directions.EAST:
-            if self.tLoc.x < self.maxX:
-                self.tLoc.x = self.tLoc.x + 1
+            if x < self.maxX:
+                x = x + 1
 
         if direction == Directions.WEST:
-            if self.tLoc.x > 0:
-                self.tLoc.x = self.tLoc.x - 1
-
-        # Did Tallon just grab a bonus?
-        match = False
-        index = 0
-        for i in range(len(self.bLoc)):
-            if utils.sameLocation(self.tLoc, self.bLoc[i]):
-                match = True
-                index = i
-                self.grabbed = True
-                self.updateScoreWithBonus()
-
-        # Assumes that bonuses have different locations (now true).
-        if match:
-            self.bLoc.pop(index)
-            if len(self.bLoc) == 0:
-                print("Got the last bonus!")
-            else:
-                print("Bonus, yeah!")
+            if x > 0:
+                x = x - 1
+
+        # Poses can't be changed, so Tallon gets a new one. Anything
+        # holding on to the old one still sees where Tallon was.
+        if x != self.tLoc.x or y != self.tLoc.y:
+            self.tLoc = Pose(x, y)
+            self.cells.moveTallon(x, y)
+
+        # Did Tallon just grab a bonus? Only search the list of
+        # bonuses if there is one here. Assumes that bonuses have
+        # different locations (now true).
+        if self.cells.hasBonus(x, y):
+            self.bLoc.remove(self.tLoc)
+            self.grabbed = True
+            self.updateScoreWithBonus()
+            self.cells.removeBonus(x, y)
+            if self.events.enabled:
+                self.events.emit(BonusGrabbed(self.clock, self.tLoc,
+                                              len(self.bLoc)))
 
     # Implement nondeterministic motion, if appropriate.
     def probabilisticMotion(self, direction):
-        if config.nonDeterministic:
-            dice = random.random()
-            if dice < config.directionProbability:
+        if self.config.nonDeterministic:
+            if self.waiting[MOTION] != None:
+                self.saveStream(MOTION)
+            dice = self.motionRandom.random()
+            if dice < self.config.directionProbability:
                 return direction
             else:
                 return self.sideMove(direction)
@@ -210,7 +435,7 @@ class World():
     # Move at 90 degrees to the original direction.
     def sideMove(self, direction):
         # Do we head left or right of the intended direction?
-        dice = random.random()
+        dice = self.motionRandom.random()
         if dice > 0.5:
             left = True
         else:
@@ -244,33 +469,99 @@ class World():
     # Need a decrementDifference function to tidy things up
     #
     def updateMeanie(self):
-        if config.dynamic:
+        self.observation = None
+        if self.config.dynamic:
+            if self.waiting[MEANIE] != None:
+                self.saveStream(MEANIE)
+            if len(self.mLoc) >= self.vectorThreshold and haveNumpy():
+                self.updateMeanieVectorized()
+                return
             for i in range(len(self.mLoc)):
-                if utils.separation(self.mLoc[i], self.tLoc) < config.senseDistance:
+                if utils.separation(self.mLoc[i], self.tLoc) < self.config.senseDistance:
                     self.moveToTallon(i)
                 else:
                     self.makeRandomMove(i)
 
+    # Move all the Meanies at once.
+    #
+    # This does what the loop in updateMeanie() does, using arrays:
+    # the Meanies that can sense Tallon (compared using squared
+    # distances) do what moveToTallon() does, and the rest do what
+    # makeRandomMove() does. The random numbers come from a numpy
+    # generator seeded from meanieRandom, so games are still
+    # repeatable with the same numpy. They are not the numbers the
+    # loop would draw, though, and the pool of free cells is rebuilt
+    # in a different order, so a seeded game doesn't play out the same
+    # way with and without numpy. Rather than updating the occupancy
+    # grid Meanie by Meanie, the counts and the smell field are
+    # rebuilt in one go.
+    def updateMeanieVectorized(self):
+        n = len(self.mLoc)
+        rng = np.random.default_rng(self.meanieRandom.getrandbits(64))
+        loc = np.fromiter(itertools.chain.from_iterable(self.mLoc),
+                          dtype=np.int64, count=2 * n)
+        x = loc[0::2]
+        y = loc[1::2]
+        dX = x - self.tLoc.x
+        dY = y - self.tLoc.y
+        sense = (dX * dX + dY * dY) < self.config.senseDistanceSquared
+
+        # One dice per Meanie. For chasers it picks y over x when both
+        # differ; for wanderers it picks x over y.
+        dice = rng.random(n) > 0.5
+        change = rng.integers(0, 3, n) - 1
+
+        chaseY = (dX == 0) | ((dY != 0) & dice)
+        moveX = np.where(sense, ~chaseY * -np.sign(dX), dice * -change)
+        moveY = np.where(sense, chaseY * -np.sign(dY), ~dice * -change)
+        x = np.clip(x + moveX, 0, self.maxX)
+        y = np.clip(y + moveY, 0, self.maxY)
+        # Poses are tuples, so they can be made without going through
+        # Pose(), which is quicker for long lists.
+        self.mLoc = list(map(tuple.__new__, itertools.repeat(Pose),
+                             zip(x.tolist(), y.tolist())))
+
+        width = self.maxX + 1
+        cells = width * (self.maxY + 1)
+        counts = np.bincount(y * width + x, minlength=cells)
+        grid = counts.reshape(self.maxY + 1, width)
+        smelly = np.zeros_like(grid)
+        smelly[1:, :] += grid[:-1, :]
+        smelly[:-1, :] += grid[1:, :]
+        smelly[:, 1:] += grid[:, :-1]
+        smelly[:, :-1] += grid[:, 1:]
+
+        # The free cells are the ones with no Meanies that are not
+        # reserved and don't have Tallon in them.
+        free = (counts == 0) & ~np.array(self.cells.reserved, dtype=bool)
+        free[self.cells.tallon] = False
+        free = np.flatnonzero(free)
+        position = np.full(cells, -1, dtype=np.int64)
+        position[free] = np.arange(len(free))
+        self.cells.setMeanies(counts.tolist(), smelly.ravel().tolist(),
+                              free.tolist(), position.tolist())
+
     # Head towards Tallon
     def moveToTallon(self, i):
         target = self.tLoc
+        x = self.mLoc[i].x
+        y = self.mLoc[i].y
         # If same x-coordinate, move in the y direction
-        if self.mLoc[i].x == target.x:
-            self.mLoc[i].y = self.reduceDifference(self.mLoc[i].y, target.y)
+        if x == target.x:
+            y = self.reduceDifference(y, target.y)
         # If same y-coordinate, move in the x direction
-        elif self.mLoc[i].y == target.y:
-            self.mLoc[i].x = self.reduceDifference(self.mLoc[i].x, target.x)
+        elif y == target.y:
+            x = self.reduceDifference(x, target.x)
         # If x and y both differ, approximate a diagonal
         # approach by randomising between moving in the x and
         # y direction.
         else:
-            dice = random.random()
+            dice = self.meanieRandom.random()
             if dice > 0.5:
-                self.mLoc[i].y = self.reduceDifference(
-                    self.mLoc[i].y, target.y)
+                y = self.reduceDifference(y, target.y)
             else:
-                self.mLoc[i].x = self.reduceDifference(
-                    self.mLoc[i].x, target.x)
+                x = self.reduceDifference(x, target.x)
+        self.moveMeanieTo(i, x, y)
 
     # Move value towards target.
     def reduceDifference(self, value, target):
@@ -284,64 +575,81 @@ class World():
     # Randomly pick to change either x or y coordinate, and then
     # randomly make a change in that coordinate.
     def makeRandomMove(self, i):
-        dice = random.random()
+        x = self.mLoc[i].x
+        y = self.mLoc[i].y
+        dice = self.meanieRandom.random()
         if dice > 0.5:
-            xChange = random.randint(0, 2) - 1
-            self.mLoc[i].x = utils.checkBounds(
-                self.maxX, self.mLoc[i].x - xChange)
+            xChange = self.meanieRandom.randint(0, 2) - 1
+            x = utils.checkBounds(self.maxX, x - xChange)
         else:
-            yChange = random.randint(0, 2) - 1
-            self.mLoc[i].y = utils.checkBounds(
-                self.maxY, self.mLoc[i].y - yChange)
+            yChange = self.meanieRandom.randint(0, 2) - 1
+            y = utils.checkBounds(self.maxY, y - yChange)
+        self.moveMeanieTo(i, x, y)
+
+    # Put Meanie i at (x, y), if that is somewhere new.
+    def moveMeanieTo(self, i, x, y):
+        old = self.mLoc[i]
+        if x != old.x or y != old.y:
+            self.mLoc[i] = Pose(x, y)
+            self.cells.moveMeanie(old.x, old.y, x, y)
 
     # Add a meanie at intervals
     def addMeanie(self):
-        if (self.clock % config.meanieInterval) == 0:
-            newLoc = utils.pickUniquePose(
-                self.maxX, self.maxY, self.locationList)
+        self.observation = None
+        if (self.clock % self.config.meanieInterval) == 0:
+            newLoc = self.pickFreePose()
+            # If the arena is full, there is nowhere to put a new
+            # Meanie.
+            if newLoc == None:
+                return
             self.mLoc.append(newLoc)
-
-            self.locationList.append(newLoc)
+            self.cells.addMeanie(newLoc.x, newLoc.y)
+            if self.events.enabled:
+                self.events.emit(MeanieAdded(self.clock, newLoc))
+
+    # Pick a location that is not in use: not where Tallon, a Meanie
+    # or a pit is, and not where a bonus is or was. Returns None if
+    # every location is in use.
+    def pickFreePose(self):
+        if self.waiting[LAYOUT] != None:
+            self.saveStream(LAYOUT)
+        c = self.cells.pickFree(self.layoutRandom)
+        if c is None:
+            return None
+        return Pose(*self.cells.coordinates(c))
 
     # Increment the clock every time the function is called
     def updateClock(self):
         self.clock += 1
+        self.observation = None
 
     # Increment the score at intervals
     def updateScore(self):
-        if (self.clock % config.scoreInterval) == 0:
+        self.observation = None
+        if (self.clock % self.config.scoreInterval) == 0:
             self.score += 1
 
     # Update the score with bonus
     def updateScoreWithBonus(self):
-        self.score += config.bonusValue
+        self.score += self.config.bonusValue
 
     # Is the given location smelly?
     #
     # A location is smelly if it is next to a Meanie
     def isSmelly(self, location):
-        if self.isAjacent(self.mloc, location):
-            return True
-        else:
-            return False
+        return self.cells.isSmelly(location.x, location.y)
 
     # Is the given location windy?
     #
     # A location is windy if it is near a pit
     def isWindy(self, location):
-        if self.isAjacent(self.ploc, location):
-            return True
-        else:
-            return False
+        return self.cells.isWindy(location.x, location.y)
 
     # Does the given location glow?
     #
     # The bonus stations glow
     def isGlowing(self, location):
-        if self.isAjacent(self.bloc, location):
-            return True
-        else:
-            return False
+        return self.cells.isGlowing(location.x, location.y)
 
     # Is the location loc next to any of the locations in locList.
     #
@@ -349,30 +657,147 @@ class World():
     # x coordinate and have a y coordinate that differs by 1, or in
     # the same y coordinate and have an x coordinate that differs by
     # one.
+    #
+    # The world itself keeps track of which cells are next to Meanies,
+    # pits and bonuses (see isSmelly() and friends), so this is only
+    # needed for other lists of locations.
     def isAjacent(self, locList, loc):
         for aloc in locList:
             # Ajacency holds if it holds for any location in locList.
             if aloc.x == loc.x:
                 if aloc.y == loc.y + 1 or aloc.y == loc.y - 1:
                     return True
-                else:
-                    return False
             elif aloc.y == loc.y:
                 if aloc.x == loc.x + 1 or aloc.x == loc.x - 1:
                     return True
-                else:
-                    return False
-            else:
-                return False
+        return False
 
     # Use the visibilityLimit to filter information that Tallon gets
     # about the world when appropriate
     def distanceFiltered(self, locations):
-        if config.partialVisibility:
-            filteredLocations = []
-            for loc in locations:
-                if utils.separation(self.tLoc, loc) <= config.visibilityLimit:
-                    filteredLocations.append(loc)
-            return filteredLocations
-        else:
-            return locations
+        return list(self.filterVisible(locations, self.visibleCells()))
+
+    # The mask of cells Tallon can see from where they are now, or
+    # None if Tallon can see everything.
+    def visibleCells(self):
+        if not self.config.partialVisibility:
+            return None
+        c = self.cells.cell(self.tLoc.x, self.tLoc.y)
+        visible = self.visibility.get(c)
+        if visible == None:
+            visible = bytearray((self.maxX + 1) * (self.maxY + 1))
+            for dx, dy in self.config.visibleOffsets:
+                x = self.tLoc.x + dx
+                y = self.tLoc.y + dy
+                if 0 <= x <= self.maxX and 0 <= y <= self.maxY:
+                    visible[self.cells.cell(x, y)] = 1
+            self.visibility[c] = visible
+        return visible
+
+    # The locations that are in the mask visible, as a tuple.
+    def filterVisible(self, locations, visible):
+        if visible == None:
+            return tuple(locations)
+        width = self.maxX + 1
+        return tuple([loc for loc in locations
+                      if visible[loc.y * width + loc.x]])
+
+    #
+    # Snapshots
+    #
+    # These let a planner try out possible futures. snapshot() copies
+    # everything that changes during a game in one pass, and
+    # restore() puts it back. Poses can't be changed, so copying the
+    # lists that hold them is enough. The pits, and the size of the
+    # world, never change, so they are shared rather than copied, and
+    # the occupancy grid only copies what changes (see occupancy.py).
+    #
+    # Saving the state of a random number stream is the slowest part,
+    # so it is put off until the stream is next drawn from. A snapshot
+    # holds, for each stream, a list whose one item is the state, or
+    # None while the stream hasn't been used since. Every snapshot
+    # taken since the stream was last used shares the same list, which
+    # is in self.waiting until the state is saved. A stream that isn't
+    # used before the snapshot is restored (the layout stream, unless
+    # a Meanie is added, or the motion stream when moves always go
+    # where Tallon chooses) is never saved or restored at all.
+
+    # Take a copy of the current state. Treat the result as opaque.
+    def snapshot(self):
+        streams = []
+        for i in range(len(self.waiting)):
+            if self.waiting[i] == None:
+                self.waiting[i] = [None]
+            streams.append(self.waiting[i])
+        return (self.tLoc, list(self.mLoc), list(self.bLoc),
+                self.status, self.clock, self.score, self.grabbed,
+                self.idle, self.cells.snapshot(), streams)
+
+    # Go back to the state in snap, which must have come from
+    # snapshot() on this world (or a clone of it).
+    def restore(self, snap):
+        (self.tLoc, mLoc, bLoc,
+         self.status, self.clock, self.score, self.grabbed,
+         self.idle, cells, streams) = snap
+        self.mLoc = list(mLoc)
+        self.bLoc = list(bLoc)
+        self.cells.restore(cells)
+        self.observation = None
+        for i, stream in enumerate(self.streams()):
+            state = streams[i][0]
+            # With no state saved, the stream hasn't been used since
+            # the snapshot, so it is already where it should be.
+            if state != None:
+                self.saveStream(i)
+                stream.setstate(state)
+
+    # The random number streams, in the order snapshots hold them.
+    def streams(self):
+        return (self.layoutRandom, self.meanieRandom, self.motionRandom)
+
+    # Save the state of stream i for the snapshots waiting for it,
+    # before it changes.
+    def saveStream(self, i):
+        waiting = self.waiting[i]
+        if waiting != None:
+            waiting[0] = self.streams()[i].getstate()
+            self.waiting[i] = None
+
+    # Make an independent copy of this world. The copy has the same
+    # random number streams, so left alone it plays out exactly as
+    # this world would; call reseed() on it to sample a different
+    # future.
+    def clone(self):
+        other = World.__new__(World)
+        other.seed = self.seed
+        other.agentSeed = self.agentSeed
+        other.maxX = self.maxX
+        other.maxY = self.maxY
+        other.pLoc = self.pLoc
+        other.config = self.config
+        other.visibility = self.visibility
+        other.motion = self.motion
+        other.recorder = None
+        other.events = NULL_SINK
+        other.cells = self.cells.clone()
+        other.waiting = [None, None, None]
+        other.layoutRandom = random.Random()
+        other.meanieRandom = random.Random()
+        other.motionRandom = random.Random()
+        for mine, theirs in zip(self.streams(), other.streams()):
+            theirs.setstate(mine.getstate())
+        other.restore(self.snapshot())
+        return other
+
+    # Set up the random number streams from seed.
+    def reseed(self, seed):
+        # Snapshots waiting for the old streams need their states now.
+        for i in range(len(self.waiting)):
+            if self.waiting[i] != None:
+                self.saveStream(i)
+        self.seed = seed
+        streams = random.Random(seed)
+        self.layoutRandom = random.Random(streams.getrandbits(64))
+        self.meanieRandom = random.Random(streams.getrandbits(64))
+        self.motionRandom = random.Random(streams.getrandbits(64))
+        self.agentSeed = streams.getrandbits(64)